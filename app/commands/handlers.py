@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 import asyncio
-import base64
 import html
-import ipaddress
+import socket
 from dataclasses import dataclass
-from typing import Any, Optional
+from functools import lru_cache, partial
+from typing import Any, Awaitable, Callable, Optional
+
+from cachetools import TTLCache
 
 from app.genieacs.client import GenieAcsError
 from app.genieacs.service import GenieAcsService
@@ -17,7 +19,7 @@ from app.security.validation import validate_page, validate_username
 from app.storage.pending import PendingAction, PendingStore
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class BotContext:
     nuxbill: NuxBillService
     activate_using: str
@@ -28,14 +30,14 @@ class BotContext:
     user_id: Optional[int] = None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class BotReply:
     text: str
     reply_markup: Optional[dict[str, Any]] = None
     parse_mode: Optional[str] = None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class CallbackResult:
     text: str
     reply_markup: Optional[dict[str, Any]] = None
@@ -43,17 +45,28 @@ class CallbackResult:
     parse_mode: Optional[str] = None
 
 
+_HELP_TEXT = (
+    "Perintah tersedia:\n"
+    "/customer [page] - daftar customer (interaktif)\n"
+    "/status <username> - status detail customer\n"
+    "/recharge - pilih customer & paket (interaktif)\n"
+    "/activate <username> - aktifkan kembali customer\n"
+    "/deactivate <username> - nonaktifkan customer\n"
+    "/help - menu\n"
+    "/start - menu"
+)
+
+_FMT_STATUS = "Format: /status <username>\n\n" + _HELP_TEXT
+_FMT_CUSTOMER = "Format: /customer [page]\n\n" + _HELP_TEXT
+_FMT_DEACTIVATE = "Format: /deactivate <username>\n\n" + _HELP_TEXT
+_FMT_ACTIVATE = "Format: /activate <username>\n\n" + _HELP_TEXT
+
+_RECHARGE_AGAIN_ROW = [{"text": "Recharge lagi", "callback_data": "rch_c:Active:1"}]
+_BACK_TO_CUSTOMER_ROW = [{"text": "⬅️ Kembali ke customer", "callback_data": "rch_c:Active:1"}]
+
+
 def help_text() -> str:
-    return (
-        "Perintah tersedia:\n"
-        "/customer [page] - daftar customer (interaktif)\n"
-        "/status <username> - status detail customer\n"
-        "/recharge - pilih customer & paket (interaktif)\n"
-        "/activate <username> - aktifkan kembali customer\n"
-        "/deactivate <username> - nonaktifkan customer\n"
-        "/help - menu\n"
-        "/start - menu"
-    )
+    return _HELP_TEXT
 
 
 def _fmt_pkg(pkg: Optional[Package]) -> str:
@@ -65,180 +78,229 @@ def _fmt_pkg(pkg: Optional[Package]) -> str:
     return f"{name} | {pkg.status} | exp {exp} | {router}"
 
 
-def _b64e(value: str) -> str:
-    return base64.urlsafe_b64encode(value.encode("utf-8")).decode("ascii").rstrip("=")
-
-
-def _b64d(value: str) -> str:
-    padding = "=" * (-len(value) % 4)
-    return base64.urlsafe_b64decode(value + padding).decode("utf-8")
+async def _plan_on_page(ctx: BotContext, plan_id: int, page: int) -> Plan:
+    for p in await ctx.nuxbill.list_pppoe_plans(page=page):
+        if p.id == plan_id:
+            return p
+    raise ValueError("Pilihan paket sudah kadaluarsa. Silakan pilih paket lagi.")
 
 
 def _inline_keyboard(rows: list[list[dict[str, str]]]) -> dict[str, Any]:
     return {"inline_keyboard": rows}
 
 
-def _main_menu_markup() -> dict[str, Any]:
-    return {
-        "keyboard": [
-            [{"text": "/customer"}, {"text": "/recharge"}],
-            [{"text": "/status"}, {"text": "/activate"}],
-            [{"text": "/deactivate"}, {"text": "/help"}],
-        ],
-        "resize_keyboard": True,
-        "one_time_keyboard": False,
-        "selective": True,
-    }
+_MAIN_MENU_MARKUP: dict[str, Any] = {
+    "keyboard": [
+        [{"text": "/customer"}, {"text": "/recharge"}],
+        [{"text": "/status"}, {"text": "/activate"}],
+        [{"text": "/deactivate"}, {"text": "/help"}],
+    ],
+    "resize_keyboard": True,
+    "one_time_keyboard": False,
+    "selective": True,
+}
 
 
-def _chunk_buttons(buttons: list[dict[str, str]], *, per_row: int = 2) -> list[list[dict[str, str]]]:
-    rows: list[list[dict[str, str]]] = []
-    row: list[dict[str, str]] = []
-    for b in buttons:
-        row.append(b)
-        if len(row) >= per_row:
-            rows.append(row)
-            row = []
-    if row:
-        rows.append(row)
-    return rows
+def _main_menu_markup() -> dict[str, Any]:
+    return _MAIN_MENU_MARKUP
 
 
 def _parse_int(value: str, *, field: str) -> int:
     v = value.strip()
-    if not v.isdigit():
+    if not (v.isascii() and v.isdigit()):
         raise ValueError(f"{field} harus angka")
     n = int(v)
-    if n < 1 or n > 2_000_000_000:
+    if not 1 <= n <= 2_000_000_000:
         raise ValueError(f"{field} tidak valid")
     return n
 
 
+_USING_LABELS = {
+    "cash": "Cash",
+    "transfer": "Transfer",
+    "dana": "DANA",
+    "zero": "Rp.0",
+}
+
+
 def _normalize_using(value: str) -> str:
     v = (value or "").strip().lower()
-    if v in ("cash", "transfer", "dana", "zero"):
+    if v in _USING_LABELS:
         return v
     raise ValueError("Metode pembayaran tidak valid")
 
 
 def _using_label(using: str) -> str:
-    u = _normalize_using(using)
-    if u == "cash":
-        return "Cash"
-    if u == "transfer":
-        return "Transfer"
-    if u == "dana":
-        return "DANA"
-    return "Rp.0"
+    label = _USING_LABELS.get(using)
+    if label is not None:
+        return label
+    return _USING_LABELS[_normalize_using(using)]
 
 
-def _build_customers_markup(*, status: str, page: int, customers: list[dict[str, Any]]) -> dict[str, Any]:
-    buttons: list[dict[str, str]] = []
+def _customer_id(c: dict[str, Any]) -> int:
+    raw = c.get("id")
+    if isinstance(raw, int):
+        return raw
+    if isinstance(raw, str) and raw.isdigit():
+        return int(raw)
+    return 0
+
+
+def _str_field(c: dict[str, Any], key: str) -> str:
+    raw = c.get(key)
+    if not isinstance(raw, str):
+        raw = "" if raw is None else str(raw)
+    return raw.strip()
+
+
+_MARKUP_CACHE: TTLCache = TTLCache(maxsize=256, ttl=60)
+
+
+def _cached_markup(key: tuple[Any, ...], source: list[Any]) -> Optional[dict[str, Any]]:
+    hit = _MARKUP_CACHE.get(key)
+    if hit is not None and hit[0] is source:
+        return hit[1]
+    return None
+
+
+def _store_markup(key: tuple[Any, ...], source: list[Any], markup: dict[str, Any]) -> dict[str, Any]:
+    _MARKUP_CACHE[key] = (source, markup)
+    return markup
+
+
+_TOGGLE_STATUS_ROWS: dict[tuple[str, bool], list[dict[str, str]]] = {
+    (prefix, is_active): [
+        {
+            "text": f"Tampilkan {'Inactive' if is_active else 'Active'}",
+            "callback_data": f"{prefix}:{'Inactive' if is_active else 'Active'}:1",
+        }
+    ]
+    for prefix in ("cus_l", "rch_c")
+    for is_active in (True, False)
+}
+
+
+def _build_customer_page_markup(
+    *,
+    list_prefix: str,
+    status: str,
+    page: int,
+    customers: list[dict[str, Any]],
+    pppoe_only: bool,
+    make_button: Callable[[int, str], Optional[dict[str, str]]],
+) -> dict[str, Any]:
+    cache_key = (list_prefix, status, page)
+    cached = _cached_markup(cache_key, customers)
+    if cached is not None:
+        return cached
+    rows: list[list[dict[str, str]]] = []
+    row: list[dict[str, str]] = []
     for c in customers:
         if not isinstance(c, dict):
             continue
-        try:
-            cid = int(c.get("id") or 0)
-        except Exception:
+        if pppoe_only and _str_field(c, "service_type").upper() != "PPPOE":
             continue
+        cid = _customer_id(c)
         if cid <= 0:
             continue
-        username = str(c.get("username") or "").strip()
-        if not username:
+        button = make_button(cid, _str_field(c, "username"))
+        if button is None:
             continue
-        buttons.append({"text": username, "callback_data": f"rch_selc:{cid}"})
-
-    rows = _chunk_buttons(buttons, per_row=2)
+        row.append(button)
+        if len(row) == 2:
+            rows.append(row)
+            row = []
+    if row:
+        rows.append(row)
 
     nav: list[dict[str, str]] = []
     if page > 1:
-        nav.append({"text": "⬅️ Prev", "callback_data": f"rch_c:{status}:{page - 1}"})
+        nav.append({"text": "⬅️ Prev", "callback_data": f"{list_prefix}:{status}:{page - 1}"})
     if len(customers) >= 30:
-        nav.append({"text": "Next ➡️", "callback_data": f"rch_c:{status}:{page + 1}"})
+        nav.append({"text": "Next ➡️", "callback_data": f"{list_prefix}:{status}:{page + 1}"})
     if nav:
         rows.append(nav)
 
-    other_status = "Inactive" if status.lower() == "active" else "Active"
-    rows.append(
-        [
-            {"text": f"Tampilkan {other_status}", "callback_data": f"rch_c:{other_status}:1"},
-        ]
+    rows.append(_TOGGLE_STATUS_ROWS[(list_prefix, status.lower() == "active")])
+    return _store_markup(cache_key, customers, _inline_keyboard(rows))
+
+
+def _build_customers_markup(*, status: str, page: int, customers: list[dict[str, Any]]) -> dict[str, Any]:
+    def _button(cid: int, username: str) -> Optional[dict[str, str]]:
+        if not username:
+            return None
+        return {"text": username, "callback_data": f"rch_selc:{cid}"}
+
+    return _build_customer_page_markup(
+        list_prefix="rch_c",
+        status=status,
+        page=page,
+        customers=customers,
+        pppoe_only=False,
+        make_button=_button,
     )
-    return _inline_keyboard(rows)
 
 
 def _build_customer_list_markup(*, status: str, page: int, customers: list[dict[str, Any]]) -> dict[str, Any]:
-    buttons: list[dict[str, str]] = []
-    for c in customers:
-        if not isinstance(c, dict):
-            continue
-        if str(c.get("service_type") or "").upper() != "PPPOE":
-            continue
-        try:
-            cid = int(c.get("id") or 0)
-        except Exception:
-            continue
-        if cid <= 0:
-            continue
-        username = str(c.get("username") or "").strip()
+    def _button(cid: int, username: str) -> Optional[dict[str, str]]:
         label = username or f"id={cid}"
-        buttons.append({"text": label[:64], "callback_data": f"cus_v:{cid}:{status}:{page}"})
-
-    rows = _chunk_buttons(buttons, per_row=2)
-
-    nav: list[dict[str, str]] = []
-    if page > 1:
-        nav.append({"text": "⬅️ Prev", "callback_data": f"cus_l:{status}:{page - 1}"})
-    if len(customers) >= 30:
-        nav.append({"text": "Next ➡️", "callback_data": f"cus_l:{status}:{page + 1}"})
-    if nav:
-        rows.append(nav)
-
-    other_status = "Inactive" if status.lower() == "active" else "Active"
-    rows.append([{"text": f"Tampilkan {other_status}", "callback_data": f"cus_l:{other_status}:1"}])
-    return _inline_keyboard(rows)
+        return {"text": label[:64], "callback_data": f"cus_v:{cid}:{status}:{page}"}
+
+    return _build_customer_page_markup(
+        list_prefix="cus_l",
+        status=status,
+        page=page,
+        customers=customers,
+        pppoe_only=True,
+        make_button=_button,
+    )
 
 
 def _first_activation(view: dict[str, Any]) -> Optional[dict[str, Any]]:
-    raw = view.get("activation") or []
-    if not isinstance(raw, list):
+    raw = view.get("activation")
+    if not raw or not isinstance(raw, list):
         return None
+    first = raw[0]
+    if isinstance(first, dict):
+        return first
     for item in raw:
         if isinstance(item, dict):
             return item
     return None
 
 
+@lru_cache(maxsize=512)
 def _build_customer_detail_markup(*, customer_id: int, status: str, page: int, onu_enabled: bool) -> dict[str, Any]:
-    rows: list[list[dict[str, str]]] = []
-    if onu_enabled:
-        rows.append([{"text": "Remote ONU", "callback_data": f"cus_onu:{customer_id}:{status}:{page}"}])
-    rows.append(
+    suffix = f"{customer_id}:{status}:{page}"
+    rows = [
         [
-            {"text": "Ganti SSID", "callback_data": f"wifi_ssid:{customer_id}:{status}:{page}"},
-            {"text": "Ganti Password", "callback_data": f"wifi_pwd:{customer_id}:{status}:{page}"},
-        ]
-    )
-    rows.append(
+            {"text": "Ganti SSID", "callback_data": f"wifi_ssid:{suffix}"},
+            {"text": "Ganti Password", "callback_data": f"wifi_pwd:{suffix}"},
+        ],
         [
-            {"text": "Deactivate", "callback_data": f"cus_d:{customer_id}:{status}:{page}"},
+            {"text": "Deactivate", "callback_data": f"cus_d:{suffix}"},
             {"text": "Recharge", "callback_data": f"rch_selc:{customer_id}"},
-        ]
-    )
-    rows.append([{"text": "⬅️ Back", "callback_data": f"cus_l:{status}:{page}"}])
+        ],
+        [{"text": "⬅️ Back", "callback_data": f"cus_l:{status}:{page}"}],
+    ]
+    if onu_enabled:
+        rows.insert(0, [{"text": "Remote ONU", "callback_data": f"cus_onu:{suffix}"}])
     return _inline_keyboard(rows)
 
 
+@lru_cache(maxsize=256)
 def _build_status_markup(*, customer_id: int, onu_enabled: bool) -> Optional[dict[str, Any]]:
     if not onu_enabled:
         return None
     return _inline_keyboard([[{"text": "Remote ONU", "callback_data": f"onu_go:{customer_id}"}]])
 
 
+@lru_cache(maxsize=128)
 def _build_cancel_markup(action_id: str) -> dict[str, Any]:
     return _inline_keyboard([[{"text": "Batal", "callback_data": f"wifi_cancel:{action_id}"}]])
 
 
+@lru_cache(maxsize=128)
 def _build_confirm_markup(action_id: str) -> dict[str, Any]:
     return _inline_keyboard(
         [
@@ -250,6 +312,11 @@ def _build_confirm_markup(action_id: str) -> dict[str, Any]:
     )
 
 
+@lru_cache(maxsize=256)
+def _build_customer_back_markup(*, customer_id: int, status: str, page: int) -> dict[str, Any]:
+    return _inline_keyboard([[{"text": "⬅️ Back", "callback_data": f"cus_v:{customer_id}:{status}:{page}"}]])
+
+
 def _pppoe_username_from_customer(view: dict[str, Any]) -> Optional[str]:
     d = view.get("d")
     if isinstance(d, dict):
@@ -272,6 +339,16 @@ def _build_onu_open_markup(*, url: str, back_data: str) -> dict[str, Any]:
     )
 
 
+def _is_valid_ip(value: str) -> bool:
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, value)
+            return True
+        except OSError:
+            continue
+    return False
+
+
 def _extract_pppoe_ip(view: dict[str, Any]) -> Optional[str]:
     d = view.get("d")
     if not isinstance(d, dict):
@@ -280,41 +357,38 @@ def _extract_pppoe_ip(view: dict[str, Any]) -> Optional[str]:
     return ip or None
 
 
-async def _render_status(ctx: BotContext, *, customer_id: int) -> CallbackResult:
-    view = await ctx.nuxbill.get_customer_view_by_id(customer_id)
+def _render_status(ctx: BotContext, *, view: dict[str, Any]) -> CallbackResult:
     cust = ctx.nuxbill.parse_customer(view)
-    pkgs = ctx.nuxbill.parse_packages(view)
-    pppoe = ctx.nuxbill.pick_active_pppoe_package(pkgs)
-    lines = [
+    pppoe = ctx.nuxbill.parse_pppoe_packages(view).pick_pppoe()
+    ip = _extract_pppoe_ip(view)
+    lines = (
         f"Nama: {cust.fullname}",
         f"Username: {cust.username}",
         f"Status akun: {cust.status}",
-    ]
-    ip = _extract_pppoe_ip(view)
-    if ip:
-        lines.append(f"IP: {ip}")
-    if cust.pppoe_username:
-        lines.append(f"PPPoE username: {cust.pppoe_username}")
-    if cust.service_type:
-        lines.append(f"Service type: {cust.service_type}")
-    lines.append(f"Paket: {_fmt_pkg(pppoe)}")
+        f"IP: {ip}" if ip else "",
+        f"PPPoE username: {cust.pppoe_username}" if cust.pppoe_username else "",
+        f"Service type: {cust.service_type}" if cust.service_type else "",
+        f"Paket: {_fmt_pkg(pppoe)}",
+    )
     onu_enabled = ctx.mikrotik is not None and ctx.genieacs is not None
-    return CallbackResult("\n".join(lines), reply_markup=_build_status_markup(customer_id=customer_id, onu_enabled=onu_enabled))
+    return CallbackResult(
+        "\n".join(line for line in lines if line),
+        reply_markup=_build_status_markup(customer_id=cust.id, onu_enabled=onu_enabled),
+    )
 
 
 def _build_plans_markup(*, customer_id: int, page: int, plans: list[Plan]) -> dict[str, Any]:
-    buttons: list[dict[str, str]] = []
-    for p in plans:
-        label = p.name_plan.strip() or f"plan_id={p.id}"
-        server = p.server_name()
-        buttons.append(
+    prefix = f"rch_pay:{customer_id}:"
+    suffix = f":{page}"
+    rows = [
+        [
             {
-                "text": label[:64],
-                "callback_data": f"rch_pay:{customer_id}:{p.id}:{_b64e(server)}:{page}",
+                "text": (p.name_plan.strip() or f"plan_id={p.id}")[:64],
+                "callback_data": f"{prefix}{p.id}{suffix}",
             }
-        )
-
-    rows = _chunk_buttons(buttons, per_row=1)
+        ]
+        for p in plans
+    ]
 
     nav: list[dict[str, str]] = []
     if page > 1:
@@ -324,478 +398,508 @@ def _build_plans_markup(*, customer_id: int, page: int, plans: list[Plan]) -> di
     if nav:
         rows.append(nav)
 
-    rows.append([{"text": "⬅️ Kembali ke customer", "callback_data": "rch_c:Active:1"}])
+    rows.append(_BACK_TO_CUSTOMER_ROW)
     return _inline_keyboard(rows)
 
 
-def _build_payment_markup(*, customer_id: int, plan_id: int, server: str, page: int) -> dict[str, Any]:
-    s = _b64e(server)
-    options = [
-        ("cash", "Cash"),
-        ("transfer", "Transfer"),
-        ("dana", "DANA"),
-        ("zero", "Rp.0"),
-    ]
+@lru_cache(maxsize=256)
+def _build_payment_markup(*, customer_id: int, plan_id: int, page: int) -> dict[str, Any]:
+    prefix = f"rch_do:{customer_id}:{plan_id}:"
+    suffix = f":{page}"
     rows = [
-        [{"text": label, "callback_data": f"rch_do:{customer_id}:{plan_id}:{s}:{using}:{page}"}]
-        for using, label in options
+        [{"text": label, "callback_data": f"{prefix}{using}{suffix}"}]
+        for using, label in _USING_LABELS.items()
     ]
     rows.append([{"text": "⬅️ Kembali ke paket", "callback_data": f"rch_pl:{customer_id}:{page}"}])
-    rows.append([{"text": "⬅️ Kembali ke customer", "callback_data": "rch_c:Active:1"}])
+    rows.append(_BACK_TO_CUSTOMER_ROW)
     return _inline_keyboard(rows)
 
 
+async def _cmd_pending_input(ctx: BotContext, args: list[str]) -> BotReply:
+    if ctx.pending is None:
+        return BotReply("Fitur input belum tersedia.")
+    if len(args) != 2:
+        return BotReply("Format input tidak valid.")
+    action_id = str(args[0] or "")
+    text = str(args[1] or "").strip()
+    action = ctx.pending.get_by_id(action_id)
+    if action is None:
+        return BotReply("Permintaan sudah kadaluarsa.")
+    if action.kind == "ssid":
+        value = text.strip()
+        if len(value) < 1 or len(value) > 32:
+            return BotReply("SSID tidak valid (1-32 karakter).", reply_markup=_build_cancel_markup(action_id))
+        action.value = value
+        action.stage = "confirm"
+        ctx.pending.set_by_id(action_id, action)
+        return BotReply(
+            f"Konfirmasi ganti SSID menjadi:\n{value}\n\nLanjutkan?",
+            reply_markup=_build_confirm_markup(action_id),
+        )
+    if action.kind == "password":
+        value = text
+        if len(value) < 8:
+            return BotReply("Password minimal 8 karakter.", reply_markup=_build_cancel_markup(action_id))
+        action.value = value
+        action.stage = "confirm"
+        ctx.pending.set_by_id(action_id, action)
+        return BotReply(
+            "Konfirmasi ganti password WiFi.\n\nLanjutkan?",
+            reply_markup=_build_confirm_markup(action_id),
+        )
+    return BotReply("Permintaan tidak dikenali.")
+
+
+async def _cmd_help(ctx: BotContext, args: list[str]) -> BotReply:
+    return BotReply("Pilih menu:", reply_markup=_main_menu_markup())
+
+
+async def _cmd_status(ctx: BotContext, args: list[str]) -> BotReply:
+    if len(args) != 1:
+        return BotReply(_FMT_STATUS)
+    username = validate_username(args[0])
+    view = await ctx.nuxbill.get_customer_view_by_username(username)
+    rendered = _render_status(ctx, view=view)
+    return BotReply(rendered.text, reply_markup=rendered.reply_markup)
+
+
+async def _cmd_customer(ctx: BotContext, args: list[str]) -> BotReply:
+    page = 1
+    if args:
+        if len(args) != 1:
+            return BotReply(_FMT_CUSTOMER)
+        page = validate_page(args[0])
+    status = "Active"
+    customers = await ctx.nuxbill.list_customers(status_filter=status, page=page)
+    text = f"Daftar customer PPPoE ({status}, page {page}):"
+    return BotReply(text, reply_markup=_build_customer_list_markup(status=status, page=page, customers=customers))
+
+
+async def _cmd_recharge(ctx: BotContext, args: list[str]) -> BotReply:
+    status = "Active"
+    page = 1
+    customers, _ = await asyncio.gather(
+        ctx.nuxbill.list_customers(status_filter=status, page=page),
+        ctx.nuxbill.list_pppoe_plans(page=1),
+        return_exceptions=True,
+    )
+    if isinstance(customers, BaseException):
+        raise customers
+    text = f"Pilih customer ({status}, page {page}):"
+    return BotReply(text, reply_markup=_build_customers_markup(status=status, page=page, customers=customers))
+
+
+async def _cmd_deactivate(ctx: BotContext, args: list[str]) -> BotReply:
+    if len(args) != 1:
+        return BotReply(_FMT_DEACTIVATE)
+    username = validate_username(args[0])
+    view = await ctx.nuxbill.get_customer_view_by_username(username)
+    cust = ctx.nuxbill.parse_customer(view)
+    active = ctx.nuxbill.parse_pppoe_packages(view).active_pppoe
+    if not active:
+        return BotReply("Tidak ada paket PPPoE aktif untuk dinonaktifkan.")
+    await ctx.nuxbill.deactivate(customer_id=cust.id, plan_id=active.plan_id)
+    return BotReply(f"Deaktivasi berhasil untuk {cust.username} (plan_id={active.plan_id}).")
+
+
+async def _cmd_activate(ctx: BotContext, args: list[str]) -> BotReply:
+    if len(args) != 1:
+        return BotReply(_FMT_ACTIVATE)
+    username = validate_username(args[0])
+    view = await ctx.nuxbill.get_customer_view_by_username(username)
+    cust = ctx.nuxbill.parse_customer(view)
+    parsed = ctx.nuxbill.parse_pppoe_packages(view)
+    active = parsed.active_pppoe
+    last_pppoe = parsed.last_pppoe
+
+    if active:
+        await ctx.nuxbill.sync(customer_id=cust.id)
+        return BotReply(f"Customer masih aktif. Sync dijalankan untuk {cust.username}.")
+
+    if not last_pppoe:
+        return BotReply("Tidak ada riwayat paket PPPoE untuk diaktifkan.")
+
+    server = last_pppoe.routers or "radius"
+    await ctx.nuxbill.recharge_by_plan_id(
+        customer_id=cust.id,
+        plan_id=last_pppoe.plan_id,
+        server=server,
+        using=ctx.activate_using,
+    )
+    return BotReply(f"Aktivasi berhasil untuk {cust.username} (plan_id={last_pppoe.plan_id}).")
+
+
+_COMMAND_HANDLERS: dict[str, Callable[[BotContext, list[str]], Awaitable[BotReply]]] = {
+    "pending_input": _cmd_pending_input,
+    "help": _cmd_help,
+    "start": _cmd_help,
+    "status": _cmd_status,
+    "customer": _cmd_customer,
+    "recharge": _cmd_recharge,
+    "deactivate": _cmd_deactivate,
+    "activate": _cmd_activate,
+}
+
+
+_REPLY_UNKNOWN = BotReply("Perintah tidak dikenal.", reply_markup=_MAIN_MENU_MARKUP)
+_REPLY_TIMEOUT = BotReply("Timeout saat mengakses NuxBill. Coba lagi.")
+_REPLY_INTERNAL = BotReply("Terjadi kesalahan internal.")
+
+
 async def handle_command(ctx: BotContext, name: str, args: list[str]) -> BotReply:
+    handler = _COMMAND_HANDLERS.get(name)
+    if handler is None:
+        return _REPLY_UNKNOWN
     try:
-        if name == "pending_input":
-            if ctx.pending is None:
-                return BotReply("Fitur input belum tersedia.")
-            if len(args) != 2:
-                return BotReply("Format input tidak valid.")
-            action_id = str(args[0] or "")
-            text = str(args[1] or "").strip()
-            action = ctx.pending.get_by_id(action_id)
-            if action is None:
-                return BotReply("Permintaan sudah kadaluarsa.")
-            if action.kind == "ssid":
-                value = text.strip()
-                if len(value) < 1 or len(value) > 32:
-                    return BotReply("SSID tidak valid (1-32 karakter).", reply_markup=_build_cancel_markup(action_id))
-                action.value = value
-                action.stage = "confirm"
-                ctx.pending.set_by_id(action_id, action)
-                return BotReply(
-                    f"Konfirmasi ganti SSID menjadi:\n{value}\n\nLanjutkan?",
-                    reply_markup=_build_confirm_markup(action_id),
-                )
-            if action.kind == "password":
-                value = text
-                if len(value) < 8:
-                    return BotReply("Password minimal 8 karakter.", reply_markup=_build_cancel_markup(action_id))
-                action.value = value
-                action.stage = "confirm"
-                ctx.pending.set_by_id(action_id, action)
-                return BotReply(
-                    "Konfirmasi ganti password WiFi.\n\nLanjutkan?",
-                    reply_markup=_build_confirm_markup(action_id),
-                )
-            return BotReply("Permintaan tidak dikenali.")
-
-        if name in ("help", "start"):
-            return BotReply("Pilih menu:", reply_markup=_main_menu_markup())
-
-        if name == "status":
-            if len(args) != 1:
-                return BotReply("Format: /status <username>\n\n" + help_text())
-            username = validate_username(args[0])
-            view = await ctx.nuxbill.get_customer_view_by_username(username)
-            cust = ctx.nuxbill.parse_customer(view)
-            rendered = await _render_status(ctx, customer_id=cust.id)
-            return BotReply(rendered.text, reply_markup=rendered.reply_markup)
-
-        if name == "customer":
-            page = 1
-            if args:
-                if len(args) != 1:
-                    return BotReply("Format: /customer [page]\n\n" + help_text())
-                page = validate_page(args[0])
-            status = "Active"
-            customers = await ctx.nuxbill.list_customers(status_filter=status, page=page)
-            text = f"Daftar customer PPPoE ({status}, page {page}):"
-            return BotReply(text, reply_markup=_build_customer_list_markup(status=status, page=page, customers=customers))
-
-        if name == "recharge":
-            status = "Active"
-            page = 1
-            customers = await ctx.nuxbill.list_customers(status_filter=status, page=page)
-            text = f"Pilih customer ({status}, page {page}):"
-            return BotReply(text, reply_markup=_build_customers_markup(status=status, page=page, customers=customers))
-
-        if name == "deactivate":
-            if len(args) != 1:
-                return BotReply("Format: /deactivate <username>\n\n" + help_text())
-            username = validate_username(args[0])
-            view = await ctx.nuxbill.get_customer_view_by_username(username)
-            cust = ctx.nuxbill.parse_customer(view)
-            pkgs = ctx.nuxbill.parse_packages(view)
-            active = None
-            for p in pkgs:
-                if p.type.upper() == "PPPOE" and p.status.lower() == "on":
-                    active = p
-                    break
-            if not active:
-                return BotReply("Tidak ada paket PPPoE aktif untuk dinonaktifkan.")
-            await ctx.nuxbill.deactivate(customer_id=cust.id, plan_id=active.plan_id)
-            return BotReply(f"Deaktivasi berhasil untuk {cust.username} (plan_id={active.plan_id}).")
-
-        if name == "activate":
-            if len(args) != 1:
-                return BotReply("Format: /activate <username>\n\n" + help_text())
-            username = validate_username(args[0])
-            view = await ctx.nuxbill.get_customer_view_by_username(username)
-            cust = ctx.nuxbill.parse_customer(view)
-            pkgs = ctx.nuxbill.parse_packages(view)
-            active = None
-            last_pppoe = None
-            for p in pkgs:
-                if p.type.upper() == "PPPOE":
-                    if last_pppoe is None:
-                        last_pppoe = p
-                    if p.status.lower() == "on":
-                        active = p
-                        break
-
-            if active:
-                await ctx.nuxbill.sync(customer_id=cust.id)
-                return BotReply(f"Customer masih aktif. Sync dijalankan untuk {cust.username}.")
-
-            if not last_pppoe:
-                return BotReply("Tidak ada riwayat paket PPPoE untuk diaktifkan.")
-
-            server = last_pppoe.routers or "radius"
-            await ctx.nuxbill.recharge_by_plan_id(
-                customer_id=cust.id,
-                plan_id=last_pppoe.plan_id,
-                server=server,
-                using=ctx.activate_using,
-            )
-            return BotReply(f"Aktivasi berhasil untuk {cust.username} (plan_id={last_pppoe.plan_id}).")
-
-        return BotReply("Perintah tidak dikenal.", reply_markup=_main_menu_markup())
+        return await handler(ctx, args)
     except asyncio.TimeoutError:
-        return BotReply("Timeout saat mengakses NuxBill. Coba lagi.")
+        return _REPLY_TIMEOUT
     except ValueError as exc:
         return BotReply(str(exc))
     except NuxBillError as exc:
         return BotReply(f"NuxBill error: {exc}")
     except Exception:
-        return BotReply("Terjadi kesalahan internal.")
+        return _REPLY_INTERNAL
 
 
-async def handle_callback(ctx: BotContext, data: str) -> CallbackResult:
-    try:
-        if not data:
-            return CallbackResult("Perintah tidak dikenali.", answer="Perintah tidak dikenali")
-
-        if data.startswith("onu_st:"):
-            parts = data.split(":", 1)
-            customer_id = _parse_int(parts[1], field="Customer ID")
-            return await _render_status(ctx, customer_id=customer_id)
-
-        if data.startswith("onu_go:"):
-            if ctx.mikrotik is None or ctx.genieacs is None:
-                return CallbackResult("Remote ONU belum dikonfigurasi.", answer="Belum dikonfigurasi")
-            parts = data.split(":", 1)
-            customer_id = _parse_int(parts[1], field="Customer ID")
-            view = await ctx.nuxbill.get_customer_view_by_id(customer_id)
-            cust = ctx.nuxbill.parse_customer(view)
-            pppoe_username = _pppoe_username_from_customer(view)
-            if not pppoe_username:
-                return CallbackResult("PPPoE username tidak ditemukan di NuxBill.", answer="PPPoE username kosong")
-            device_id = await ctx.genieacs.resolve_device_id_by_pppoe_username(pppoe_username=pppoe_username)
-            ip = await ctx.genieacs.get_virtual_param(device_id=device_id, name="IPTR069")
-            try:
-                ipaddress.ip_address(ip)
-            except ValueError:
-                return CallbackResult("IPTR069 tidak valid.", answer="IP invalid")
-            result = await ctx.mikrotik.ensure_onu_forward(to_address=ip, to_port=80)
-            url = f"http://{ctx.mikrotik.onu.ip_public.strip()}:{int(ctx.mikrotik.onu.port_onu)}"
-            text = "\n".join(
-                [
-                    f"Remote ONU siap untuk {cust.username}.",
-                    f"Rule: {result.get('action')}",
-                    f"URL: {url}",
-                ]
-            )
-            return CallbackResult(text, reply_markup=_build_onu_open_markup(url=url, back_data=f"onu_st:{customer_id}"), answer="OK")
-
-        if data.startswith("cus_onu:"):
-            parts = data.split(":", 3)
-            if len(parts) != 4:
-                raise ValueError("Format callback tidak valid")
-            customer_id = _parse_int(parts[1], field="Customer ID")
-            status = parts[2].strip() or "Active"
-            page = _parse_int(parts[3], field="Page")
-            if ctx.mikrotik is None or ctx.genieacs is None:
-                return CallbackResult(
-                    "Remote ONU belum dikonfigurasi.",
-                    reply_markup=_build_customer_detail_markup(
-                        customer_id=customer_id,
-                        status=status,
-                        page=page,
-                        onu_enabled=False,
-                    ),
-                    answer="Belum dikonfigurasi",
-                )
-            view = await ctx.nuxbill.get_customer_view_by_id(customer_id)
-            cust = ctx.nuxbill.parse_customer(view)
-            pppoe_username = _pppoe_username_from_customer(view)
-            if not pppoe_username:
-                return CallbackResult("PPPoE username tidak ditemukan di NuxBill.", answer="PPPoE username kosong")
-            device_id = await ctx.genieacs.resolve_device_id_by_pppoe_username(pppoe_username=pppoe_username)
-            ip = await ctx.genieacs.get_virtual_param(device_id=device_id, name="IPTR069")
-            try:
-                ipaddress.ip_address(ip)
-            except ValueError:
-                return CallbackResult("IPTR069 tidak valid.", answer="IP invalid")
-            result = await ctx.mikrotik.ensure_onu_forward(to_address=ip, to_port=80)
-            url = f"http://{ctx.mikrotik.onu.ip_public.strip()}:{int(ctx.mikrotik.onu.port_onu)}"
-            text = "\n".join(
-                [
-                    f"Remote ONU siap untuk {cust.username}.",
-                    f"Rule: {result.get('action')}",
-                    f"URL: {url}",
-                ]
-            )
-            return CallbackResult(
-                text,
-                reply_markup=_build_onu_open_markup(url=url, back_data=f"cus_v:{customer_id}:{status}:{page}"),
-                answer="OK",
-            )
-
-        if data.startswith("wifi_cancel:"):
-            if ctx.pending is None:
-                return CallbackResult("Tidak ada aksi yang bisa dibatalkan.", answer="OK")
-            action_id = data.split(":", 1)[1].strip()
-            ctx.pending.delete_by_id(action_id)
-            if ctx.user_id is not None:
-                ctx.pending.clear_chat(PendingStore.key(ctx.chat_id, ctx.user_id))
-            return CallbackResult("Dibatalkan.", answer="OK")
-
-        if data.startswith("wifi_apply:"):
-            if ctx.pending is None or ctx.genieacs is None:
-                return CallbackResult("Fitur GenieACS belum dikonfigurasi.", answer="Belum dikonfigurasi")
-            action_id = data.split(":", 1)[1].strip()
-            action = ctx.pending.get_by_id(action_id)
-            if action is None:
-                return CallbackResult("Permintaan sudah kadaluarsa.", answer="Kadaluarsa")
-            if not action.value.strip():
-                return CallbackResult("Nilai belum diisi.", answer="Belum ada nilai")
-            if action.kind == "ssid":
-                status_code = await ctx.genieacs.set_wifi_ssid(device_id=action.device_id, ssid=action.value)
-                msg = "SSID berhasil diterapkan." if status_code == 200 else "SSID dikirim (menunggu perangkat)."
-            elif action.kind == "password":
-                status_code = await ctx.genieacs.set_wifi_password(device_id=action.device_id, password=action.value)
-                msg = "Password berhasil diterapkan." if status_code == 200 else "Password dikirim (menunggu perangkat)."
-            else:
-                return CallbackResult("Permintaan tidak dikenali.", answer="Error")
-            if ctx.user_id is not None:
-                ctx.pending.clear_chat(PendingStore.key(ctx.chat_id, ctx.user_id))
-            ctx.pending.delete_by_id(action_id)
-            return CallbackResult(
-                msg,
-                reply_markup=_inline_keyboard([[{"text": "⬅️ Back", "callback_data": f"cus_v:{action.customer_id}:{action.status}:{action.page}"}]]),
-                answer="OK",
-            )
-
-        if data.startswith("wifi_ssid:") or data.startswith("wifi_pwd:"):
-            if ctx.pending is None:
-                return CallbackResult("Fitur input belum tersedia.", answer="Error")
-            if ctx.genieacs is None:
-                return CallbackResult("GenieACS belum dikonfigurasi.", answer="Belum dikonfigurasi")
-            if ctx.user_id is None:
-                return CallbackResult("User tidak dikenali.", answer="Error")
-            parts = data.split(":", 3)
-            if len(parts) != 4:
-                raise ValueError("Format callback tidak valid")
-            kind = "ssid" if parts[0] == "wifi_ssid" else "password"
-            customer_id = _parse_int(parts[1], field="Customer ID")
-            status = parts[2].strip() or "Active"
-            page = _parse_int(parts[3], field="Page")
-            view = await ctx.nuxbill.get_customer_view_by_id(customer_id)
+def _parse_status(value: str) -> str:
+    return value.strip() or "Active"
+
+
+_CUSTOMER_ID = partial(_parse_int, field="Customer ID")
+_PLAN_ID = partial(_parse_int, field="Plan ID")
+_PAGE = partial(_parse_int, field="Page")
+
+_CB_CUSTOMER = (_CUSTOMER_ID,)
+_CB_ACTION = (str.strip,)
+_CB_CUSTOMER_STATUS_PAGE = (_CUSTOMER_ID, _parse_status, _PAGE)
+_CB_STATUS_PAGE = (_parse_status, _PAGE)
+_CB_CUSTOMER_PAGE = (_CUSTOMER_ID, _PAGE)
+_CB_PAY = (_CUSTOMER_ID, _PLAN_ID, _PAGE)
+_CB_DO = (_CUSTOMER_ID, _PLAN_ID, _normalize_using, _PAGE)
+
+
+def _parse_callback(parts: list[str], schema: tuple[Callable[[str], Any], ...]) -> list[Any]:
+    if len(parts) != len(schema):
+        raise ValueError("Format callback tidak valid")
+    return [convert(part) for convert, part in zip(schema, parts)]
+
+
+async def _cb_onu_st(ctx: BotContext, parts: list[str]) -> CallbackResult:
+    (customer_id,) = _parse_callback(parts, _CB_CUSTOMER)
+    view = await ctx.nuxbill.get_customer_view_by_id(customer_id)
+    return _render_status(ctx, view=view)
+
+
+async def _open_remote_onu(
+    ctx: BotContext,
+    *,
+    mikrotik: MikrotikService,
+    genieacs: GenieAcsService,
+    customer_id: int,
+    back_data: str,
+) -> CallbackResult:
+    view = await ctx.nuxbill.get_customer_view_by_id(customer_id)
+    cust = ctx.nuxbill.parse_customer(view)
+    pppoe_username = _pppoe_username_from_customer(view)
+    if not pppoe_username:
+        return CallbackResult("PPPoE username tidak ditemukan di NuxBill.", answer="PPPoE username kosong")
+    device_id = await genieacs.resolve_device_id_by_pppoe_username(pppoe_username=pppoe_username)
+    ip = await genieacs.get_virtual_param(device_id=device_id, name="IPTR069")
+    if not _is_valid_ip(ip):
+        return CallbackResult("IPTR069 tidak valid.", answer="IP invalid")
+    result = await mikrotik.ensure_onu_forward(to_address=ip, to_port=80)
+    url = f"http://{mikrotik.onu.ip_public.strip()}:{int(mikrotik.onu.port_onu)}"
+    text = f"Remote ONU siap untuk {cust.username}.\nRule: {result.get('action')}\nURL: {url}"
+    return CallbackResult(text, reply_markup=_build_onu_open_markup(url=url, back_data=back_data), answer="OK")
+
+
+async def _cb_onu_go(ctx: BotContext, parts: list[str]) -> CallbackResult:
+    if ctx.mikrotik is None or ctx.genieacs is None:
+        return CallbackResult("Remote ONU belum dikonfigurasi.", answer="Belum dikonfigurasi")
+    (customer_id,) = _parse_callback(parts, _CB_CUSTOMER)
+    return await _open_remote_onu(
+        ctx,
+        mikrotik=ctx.mikrotik,
+        genieacs=ctx.genieacs,
+        customer_id=customer_id,
+        back_data=f"onu_st:{customer_id}",
+    )
+
+
+async def _cb_cus_onu(ctx: BotContext, parts: list[str]) -> CallbackResult:
+    customer_id, status, page = _parse_callback(parts, _CB_CUSTOMER_STATUS_PAGE)
+    if ctx.mikrotik is None or ctx.genieacs is None:
+        return CallbackResult(
+            "Remote ONU belum dikonfigurasi.",
+            reply_markup=_build_customer_detail_markup(
+                customer_id=customer_id,
+                status=status,
+                page=page,
+                onu_enabled=False,
+            ),
+            answer="Belum dikonfigurasi",
+        )
+    return await _open_remote_onu(
+        ctx,
+        mikrotik=ctx.mikrotik,
+        genieacs=ctx.genieacs,
+        customer_id=customer_id,
+        back_data=f"cus_v:{customer_id}:{status}:{page}",
+    )
+
+
+async def _cb_wifi_cancel(ctx: BotContext, parts: list[str]) -> CallbackResult:
+    if ctx.pending is None:
+        return CallbackResult("Tidak ada aksi yang bisa dibatalkan.", answer="OK")
+    (action_id,) = _parse_callback(parts, _CB_ACTION)
+    ctx.pending.delete_by_id(action_id)
+    if ctx.user_id is not None:
+        ctx.pending.clear_chat(PendingStore.key(ctx.chat_id, ctx.user_id))
+    return CallbackResult("Dibatalkan.", answer="OK")
+
+
+async def _cb_wifi_apply(ctx: BotContext, parts: list[str]) -> CallbackResult:
+    if ctx.pending is None or ctx.genieacs is None:
+        return CallbackResult("Fitur GenieACS belum dikonfigurasi.", answer="Belum dikonfigurasi")
+    (action_id,) = _parse_callback(parts, _CB_ACTION)
+    action = ctx.pending.get_by_id(action_id)
+    if action is None:
+        return CallbackResult("Permintaan sudah kadaluarsa.", answer="Kadaluarsa")
+    if not action.value.strip():
+        return CallbackResult("Nilai belum diisi.", answer="Belum ada nilai")
+    if action.kind == "ssid":
+        status_code = await ctx.genieacs.set_wifi_ssid(device_id=action.device_id, ssid=action.value)
+        msg = "SSID berhasil diterapkan." if status_code == 200 else "SSID dikirim (menunggu perangkat)."
+    elif action.kind == "password":
+        status_code = await ctx.genieacs.set_wifi_password(device_id=action.device_id, password=action.value)
+        msg = "Password berhasil diterapkan." if status_code == 200 else "Password dikirim (menunggu perangkat)."
+    else:
+        return CallbackResult("Permintaan tidak dikenali.", answer="Error")
+    if ctx.user_id is not None:
+        ctx.pending.clear_chat(PendingStore.key(ctx.chat_id, ctx.user_id))
+    ctx.pending.delete_by_id(action_id)
+    return CallbackResult(
+        msg,
+        reply_markup=_build_customer_back_markup(customer_id=action.customer_id, status=action.status, page=action.page),
+        answer="OK",
+    )
+
+
+async def _start_wifi_input(ctx: BotContext, parts: list[str], *, kind: str) -> CallbackResult:
+    if ctx.pending is None:
+        return CallbackResult("Fitur input belum tersedia.", answer="Error")
+    if ctx.genieacs is None:
+        return CallbackResult("GenieACS belum dikonfigurasi.", answer="Belum dikonfigurasi")
+    if ctx.user_id is None:
+        return CallbackResult("User tidak dikenali.", answer="Error")
+    customer_id, status, page = _parse_callback(parts, _CB_CUSTOMER_STATUS_PAGE)
+    view = await ctx.nuxbill.get_customer_view_by_id(customer_id)
+    pppoe_username = _pppoe_username_from_customer(view)
+    if not pppoe_username:
+        return CallbackResult("PPPoE username tidak ditemukan di NuxBill.", answer="PPPoE username kosong")
+    device_id = await ctx.genieacs.resolve_device_id_by_pppoe_username(pppoe_username=pppoe_username)
+    action = PendingAction(kind=kind, customer_id=customer_id, status=status, page=page, device_id=device_id)
+    chat_key = PendingStore.key(ctx.chat_id, ctx.user_id)
+    ctx.pending.clear_chat(chat_key)
+    action_id = ctx.pending.start(chat_key=chat_key, action=action)
+    if kind == "ssid":
+        return CallbackResult(
+            "Ketik SSID baru (2.4GHz):",
+            reply_markup=_build_cancel_markup(action_id),
+            answer="OK",
+        )
+    return CallbackResult(
+        "Ketik Password WiFi baru (minimal 8 karakter):",
+        reply_markup=_build_cancel_markup(action_id),
+        answer="OK",
+    )
+
+
+async def _cb_wifi_ssid(ctx: BotContext, parts: list[str]) -> CallbackResult:
+    return await _start_wifi_input(ctx, parts, kind="ssid")
+
+
+async def _cb_wifi_pwd(ctx: BotContext, parts: list[str]) -> CallbackResult:
+    return await _start_wifi_input(ctx, parts, kind="password")
+
+
+async def _cb_cus_l(ctx: BotContext, parts: list[str]) -> CallbackResult:
+    status, page = _parse_callback(parts, _CB_STATUS_PAGE)
+    customers = await ctx.nuxbill.list_customers(status_filter=status, page=page)
+    text = f"Daftar customer PPPoE ({status}, page {page}):"
+    return CallbackResult(text, reply_markup=_build_customer_list_markup(status=status, page=page, customers=customers))
+
+
+async def _cb_cus_v(ctx: BotContext, parts: list[str]) -> CallbackResult:
+    customer_id, status, page = _parse_callback(parts, _CB_CUSTOMER_STATUS_PAGE)
+    view = await ctx.nuxbill.get_customer_view_by_id(customer_id)
+    cust = ctx.nuxbill.parse_customer(view)
+    d = view.get("d")
+    if not isinstance(d, dict):
+        d = {}
+    ip = str(d.get("pppoe_ip") or d.get("pppoe_ip_address") or d.get("ip") or "-")
+    act = _first_activation(view) or {}
+    recharged_on = str(act.get("recharged_on") or "-")
+    expiration = str(act.get("expiration") or "-")
+    ctype = str(act.get("type") or cust.service_type or "-")
+    rxpower = "-"
+    if ctx.genieacs is not None:
+        try:
             pppoe_username = _pppoe_username_from_customer(view)
-            if not pppoe_username:
-                return CallbackResult("PPPoE username tidak ditemukan di NuxBill.", answer="PPPoE username kosong")
-            device_id = await ctx.genieacs.resolve_device_id_by_pppoe_username(pppoe_username=pppoe_username)
-            action = PendingAction(kind=kind, customer_id=customer_id, status=status, page=page, device_id=device_id)
-            chat_key = PendingStore.key(ctx.chat_id, ctx.user_id)
-            ctx.pending.clear_chat(chat_key)
-            action_id = ctx.pending.start(chat_key=chat_key, action=action)
-            if kind == "ssid":
-                return CallbackResult(
-                    "Ketik SSID baru (2.4GHz):",
-                    reply_markup=_build_cancel_markup(action_id),
-                    answer="OK",
-                )
-            return CallbackResult(
-                "Ketik Password WiFi baru (minimal 8 karakter):",
-                reply_markup=_build_cancel_markup(action_id),
-                answer="OK",
-            )
-
-        if data.startswith("cus_l:"):
-            parts = data.split(":", 2)
-            if len(parts) != 3:
-                raise ValueError("Format callback tidak valid")
-            status = parts[1].strip() or "Active"
-            page = _parse_int(parts[2], field="Page")
-            customers = await ctx.nuxbill.list_customers(status_filter=status, page=page)
-            text = f"Daftar customer PPPoE ({status}, page {page}):"
-            return CallbackResult(text, reply_markup=_build_customer_list_markup(status=status, page=page, customers=customers))
-
-        if data.startswith("cus_v:"):
-            parts = data.split(":", 3)
-            if len(parts) != 4:
-                raise ValueError("Format callback tidak valid")
-            customer_id = _parse_int(parts[1], field="Customer ID")
-            status = parts[2].strip() or "Active"
-            page = _parse_int(parts[3], field="Page")
-            view = await ctx.nuxbill.get_customer_view_by_id(customer_id)
-            cust = ctx.nuxbill.parse_customer(view)
-            d = view.get("d") or {}
-            ip = "-"
-            if isinstance(d, dict):
-                ip = str(d.get("pppoe_ip") or d.get("pppoe_ip_address") or d.get("ip") or "-")
-            act = _first_activation(view)
-            recharged_on = str(act.get("recharged_on") or "-") if isinstance(act, dict) else "-"
-            expiration = str(act.get("expiration") or "-") if isinstance(act, dict) else "-"
-            ctype = str(act.get("type") or cust.service_type or "-") if isinstance(act, dict) else (cust.service_type or "-")
+            if pppoe_username:
+                device_id = await ctx.genieacs.resolve_device_id_by_pppoe_username(pppoe_username=pppoe_username)
+                rxpower = await ctx.genieacs.get_virtual_param(device_id=device_id, name="RXPower")
+        except GenieAcsError:
             rxpower = "-"
-            if ctx.genieacs is not None:
-                try:
-                    pppoe_username = _pppoe_username_from_customer(view)
-                    if pppoe_username:
-                        device_id = await ctx.genieacs.resolve_device_id_by_pppoe_username(pppoe_username=pppoe_username)
-                        rxpower = await ctx.genieacs.get_virtual_param(device_id=device_id, name="RXPower")
-                except GenieAcsError:
-                    rxpower = "-"
-            rx = str(rxpower or "-").strip() or "-"
-            if rx != "-" and "dbm" not in rx.lower():
-                rx = f"{rx} dBm"
-            esc = lambda s: html.escape(str(s), quote=False)
-            lines = [
-                f"Nama: {esc(cust.fullname or '-')}",
-                f"Username: {esc(cust.username or '-')}",
-                f"IP: {esc(ip)}",
-                f"Recharged on: {esc(recharged_on)}",
-                f"Expiration: {esc(expiration)}",
-                f"Type: {esc(ctype)}",
-                f"RXPower: <b>{esc(rx)}</b>",
-            ]
-            return CallbackResult(
-                "\n".join(lines),
-                reply_markup=_build_customer_detail_markup(
-                    customer_id=customer_id,
-                    status=status,
-                    page=page,
-                    onu_enabled=ctx.mikrotik is not None and ctx.genieacs is not None,
-                ),
-                parse_mode="HTML",
-            )
-
-        if data.startswith("cus_d:"):
-            parts = data.split(":", 3)
-            if len(parts) != 4:
-                raise ValueError("Format callback tidak valid")
-            customer_id = _parse_int(parts[1], field="Customer ID")
-            status = parts[2].strip() or "Active"
-            page = _parse_int(parts[3], field="Page")
-            view = await ctx.nuxbill.get_customer_view_by_id(customer_id)
-            cust = ctx.nuxbill.parse_customer(view)
-            pkgs = ctx.nuxbill.parse_packages(view)
-            active = ctx.nuxbill.pick_active_pppoe_package(pkgs)
-            if not active:
-                return CallbackResult(
-                    f"Tidak ada paket PPPoE untuk dinonaktifkan.\n\nUsername: {cust.username}",
-                    reply_markup=_build_customer_detail_markup(
-                        customer_id=customer_id,
-                        status=status,
-                        page=page,
-                        onu_enabled=ctx.mikrotik is not None,
-                    ),
-                    answer="Tidak ada paket",
-                )
-            await ctx.nuxbill.deactivate(customer_id=cust.id, plan_id=active.plan_id)
-            return CallbackResult(
-                f"Deaktivasi berhasil untuk {cust.username} (plan_id={active.plan_id}).",
-                reply_markup=_build_customer_detail_markup(
-                    customer_id=customer_id,
-                    status=status,
-                    page=page,
-                    onu_enabled=ctx.mikrotik is not None,
-                ),
-                answer="Deaktivasi berhasil",
-            )
-
-        if data.startswith("rch_c:"):
-            parts = data.split(":", 2)
-            if len(parts) != 3:
-                raise ValueError("Format callback tidak valid")
-            status = parts[1].strip() or "Active"
-            page = _parse_int(parts[2], field="Page")
-            customers = await ctx.nuxbill.list_customers(status_filter=status, page=page)
-            text = f"Pilih customer ({status}, page {page}):"
-            return CallbackResult(text, reply_markup=_build_customers_markup(status=status, page=page, customers=customers))
-
-        if data.startswith("rch_selc:"):
-            parts = data.split(":", 1)
-            customer_id = _parse_int(parts[1], field="Customer ID")
-            view = await ctx.nuxbill.get_customer_view_by_id(customer_id)
-            cust = ctx.nuxbill.parse_customer(view)
-            page = 1
-            plans = await ctx.nuxbill.list_pppoe_plans(page=page)
-            text = f"Customer: {cust.username}\nPilih paket (page {page}):"
-            return CallbackResult(text, reply_markup=_build_plans_markup(customer_id=customer_id, page=page, plans=plans))
-
-        if data.startswith("rch_pl:"):
-            parts = data.split(":", 2)
-            if len(parts) != 3:
-                raise ValueError("Format callback tidak valid")
-            customer_id = _parse_int(parts[1], field="Customer ID")
-            page = _parse_int(parts[2], field="Page")
-            plans = await ctx.nuxbill.list_pppoe_plans(page=page)
-            text = f"Pilih paket (page {page}):"
-            return CallbackResult(text, reply_markup=_build_plans_markup(customer_id=customer_id, page=page, plans=plans))
-
-        if data.startswith("rch_pay:"):
-            parts = data.split(":", 4)
-            if len(parts) != 5:
-                raise ValueError("Format callback tidak valid")
-            customer_id = _parse_int(parts[1], field="Customer ID")
-            plan_id = _parse_int(parts[2], field="Plan ID")
-            server = _b64d(parts[3])
-            view = await ctx.nuxbill.get_customer_view_by_id(customer_id)
-            cust = ctx.nuxbill.parse_customer(view)
-            page = _parse_int(parts[4], field="Page")
-            text = f"Customer: {cust.username}\nPaket: plan_id={plan_id}\nPilih pembayaran:"
-            return CallbackResult(
-                text,
-                reply_markup=_build_payment_markup(customer_id=customer_id, plan_id=plan_id, server=server, page=page),
-                answer="Pilih pembayaran",
-            )
-
-        if data.startswith("rch_do:"):
-            parts = data.split(":", 5)
-            if len(parts) != 6:
-                raise ValueError("Format callback tidak valid")
-            customer_id = _parse_int(parts[1], field="Customer ID")
-            plan_id = _parse_int(parts[2], field="Plan ID")
-            server = _b64d(parts[3])
-            using = _normalize_using(parts[4])
-            page = _parse_int(parts[5], field="Page")
-            await ctx.nuxbill.recharge_by_plan_id(
+    rx = str(rxpower or "-").strip() or "-"
+    if rx != "-" and "dbm" not in rx.lower():
+        rx = f"{rx} dBm"
+    esc = lambda s: html.escape(str(s), quote=False)
+    text = (
+        f"Nama: {esc(cust.fullname or '-')}\n"
+        f"Username: {esc(cust.username or '-')}\n"
+        f"IP: {esc(ip)}\n"
+        f"Recharged on: {esc(recharged_on)}\n"
+        f"Expiration: {esc(expiration)}\n"
+        f"Type: {esc(ctype)}\n"
+        f"RXPower: <b>{esc(rx)}</b>"
+    )
+    return CallbackResult(
+        text,
+        reply_markup=_build_customer_detail_markup(
+            customer_id=customer_id,
+            status=status,
+            page=page,
+            onu_enabled=ctx.mikrotik is not None and ctx.genieacs is not None,
+        ),
+        parse_mode="HTML",
+    )
+
+
+async def _cb_cus_d(ctx: BotContext, parts: list[str]) -> CallbackResult:
+    customer_id, status, page = _parse_callback(parts, _CB_CUSTOMER_STATUS_PAGE)
+    view = await ctx.nuxbill.get_customer_view_by_id(customer_id)
+    cust = ctx.nuxbill.parse_customer(view)
+    active = ctx.nuxbill.parse_pppoe_packages(view).pick_pppoe()
+    if not active:
+        return CallbackResult(
+            f"Tidak ada paket PPPoE untuk dinonaktifkan.\n\nUsername: {cust.username}",
+            reply_markup=_build_customer_detail_markup(
                 customer_id=customer_id,
-                plan_id=plan_id,
-                server=server,
-                using=using,
-            )
-            view = await ctx.nuxbill.get_customer_view_by_id(customer_id)
-            cust = ctx.nuxbill.parse_customer(view)
-            text = f"Recharge berhasil untuk {cust.username} (plan_id={plan_id}) via {_using_label(using)}."
-            return CallbackResult(
-                text,
-                reply_markup=_inline_keyboard(
-                    [
-                        [{"text": "Recharge lagi", "callback_data": "rch_c:Active:1"}],
-                        [{"text": "Pilih paket lagi", "callback_data": f"rch_pl:{customer_id}:{page}"}],
-                    ]
-                ),
-                answer="Recharge berhasil",
-            )
-
-        return CallbackResult("Perintah tidak dikenali.", answer="Perintah tidak dikenali")
+                status=status,
+                page=page,
+                onu_enabled=ctx.mikrotik is not None,
+            ),
+            answer="Tidak ada paket",
+        )
+    await ctx.nuxbill.deactivate(customer_id=cust.id, plan_id=active.plan_id)
+    return CallbackResult(
+        f"Deaktivasi berhasil untuk {cust.username} (plan_id={active.plan_id}).",
+        reply_markup=_build_customer_detail_markup(
+            customer_id=customer_id,
+            status=status,
+            page=page,
+            onu_enabled=ctx.mikrotik is not None,
+        ),
+        answer="Deaktivasi berhasil",
+    )
+
+
+async def _cb_rch_c(ctx: BotContext, parts: list[str]) -> CallbackResult:
+    status, page = _parse_callback(parts, _CB_STATUS_PAGE)
+    customers = await ctx.nuxbill.list_customers(status_filter=status, page=page)
+    text = f"Pilih customer ({status}, page {page}):"
+    return CallbackResult(text, reply_markup=_build_customers_markup(status=status, page=page, customers=customers))
+
+
+async def _cb_rch_selc(ctx: BotContext, parts: list[str]) -> CallbackResult:
+    (customer_id,) = _parse_callback(parts, _CB_CUSTOMER)
+    page = 1
+    view, plans = await asyncio.gather(
+        ctx.nuxbill.get_customer_view_by_id(customer_id),
+        ctx.nuxbill.list_pppoe_plans(page=page),
+    )
+    cust = ctx.nuxbill.parse_customer(view)
+    text = f"Customer: {cust.username}\nPilih paket (page {page}):"
+    return CallbackResult(text, reply_markup=_build_plans_markup(customer_id=customer_id, page=page, plans=plans))
+
+
+async def _cb_rch_pl(ctx: BotContext, parts: list[str]) -> CallbackResult:
+    customer_id, page = _parse_callback(parts, _CB_CUSTOMER_PAGE)
+    plans = await ctx.nuxbill.list_pppoe_plans(page=page)
+    text = f"Pilih paket (page {page}):"
+    return CallbackResult(text, reply_markup=_build_plans_markup(customer_id=customer_id, page=page, plans=plans))
+
+
+async def _cb_rch_pay(ctx: BotContext, parts: list[str]) -> CallbackResult:
+    customer_id, plan_id, page = _parse_callback(parts, _CB_PAY)
+    view = await ctx.nuxbill.get_customer_view_by_id(customer_id)
+    cust = ctx.nuxbill.parse_customer(view)
+    text = f"Customer: {cust.username}\nPaket: plan_id={plan_id}\nPilih pembayaran:"
+    return CallbackResult(
+        text,
+        reply_markup=_build_payment_markup(customer_id=customer_id, plan_id=plan_id, page=page),
+        answer="Pilih pembayaran",
+    )
+
+
+async def _cb_rch_do(ctx: BotContext, parts: list[str]) -> CallbackResult:
+    customer_id, plan_id, using, page = _parse_callback(parts, _CB_DO)
+    plan = await _plan_on_page(ctx, plan_id, page)
+    await ctx.nuxbill.recharge_by_plan_id(
+        customer_id=customer_id,
+        plan_id=plan_id,
+        server=plan.server_name(),
+        using=using,
+    )
+    username = await ctx.nuxbill.get_customer_username(customer_id)
+    text = f"Recharge berhasil untuk {username} (plan_id={plan_id}) via {_using_label(using)}."
+    return CallbackResult(
+        text,
+        reply_markup=_inline_keyboard(
+            [
+                _RECHARGE_AGAIN_ROW,
+                [{"text": "Pilih paket lagi", "callback_data": f"rch_pl:{customer_id}:{page}"}],
+            ]
+        ),
+        answer="Recharge berhasil",
+    )
+
+
+_CALLBACK_HANDLERS: dict[str, Callable[[BotContext, list[str]], Awaitable[CallbackResult]]] = {
+    "onu_st": _cb_onu_st,
+    "onu_go": _cb_onu_go,
+    "cus_onu": _cb_cus_onu,
+    "wifi_cancel": _cb_wifi_cancel,
+    "wifi_apply": _cb_wifi_apply,
+    "wifi_ssid": _cb_wifi_ssid,
+    "wifi_pwd": _cb_wifi_pwd,
+    "cus_l": _cb_cus_l,
+    "cus_v": _cb_cus_v,
+    "cus_d": _cb_cus_d,
+    "rch_c": _cb_rch_c,
+    "rch_selc": _cb_rch_selc,
+    "rch_pl": _cb_rch_pl,
+    "rch_pay": _cb_rch_pay,
+    "rch_do": _cb_rch_do,
+}
+
+
+_CALLBACK_UNKNOWN = CallbackResult("Perintah tidak dikenali.", answer="Perintah tidak dikenali")
+_CALLBACK_TIMEOUT = CallbackResult("Timeout saat mengakses NuxBill. Coba lagi.", answer="Timeout")
+_CALLBACK_INTERNAL = CallbackResult("Terjadi kesalahan internal.", answer="Error")
+
+
+async def handle_callback(ctx: BotContext, data: str) -> CallbackResult:
+    try:
+        prefix, sep, rest = (data or "").partition(":")
+        handler = _CALLBACK_HANDLERS.get(prefix) if sep else None
+        if handler is None:
+            return _CALLBACK_UNKNOWN
+        return await handler(ctx, rest.split(":"))
     except asyncio.TimeoutError:
-        return CallbackResult("Timeout saat mengakses NuxBill. Coba lagi.", answer="Timeout")
+        return _CALLBACK_TIMEOUT
     except ValueError as exc:
         return CallbackResult(str(exc), answer=str(exc)[:150])
     except NuxBillError as exc:
@@ -805,4 +909,4 @@ async def handle_callback(ctx: BotContext, data: str) -> CallbackResult:
     except MikrotikError as exc:
         return CallbackResult(f"Mikrotik error: {exc}", answer="Mikrotik error")
     except Exception:
-        return CallbackResult("Terjadi kesalahan internal.", answer="Error")
+        return _CALLBACK_INTERNAL
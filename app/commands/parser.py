@@ -3,7 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ParsedCommand:
     name: str
     args: list[str]
@@ -14,14 +14,9 @@ def parse_command(text: str) -> ParsedCommand | None:
     if not t.startswith("/"):
         return None
 
-    parts = t.split()
-    if not parts:
-        return None
-
-    cmd = parts[0][1:]
-    if "@" in cmd:
-        cmd = cmd.split("@", 1)[0]
-    cmd = cmd.strip().lower()
+    head, *rest = t.split(None, 1)
+    cmd, _, _ = head[1:].partition("@")
+    cmd = cmd.lower()
     if not cmd:
         return None
-    return ParsedCommand(name=cmd, args=parts[1:])
+    return ParsedCommand(name=cmd, args=rest[0].split() if rest else [])
@@ -1,11 +1,17 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import re
 import urllib.parse
 from dataclasses import dataclass
 from typing import Any, Optional
 
 import httpx
+import orjson
+
+
+_URL_SAFE_ID = re.compile(r"[A-Za-z0-9._~-]+")
+_JSON_HEADERS = {"Content-Type": "application/json"}
 
 
 class GenieAcsError(RuntimeError):
@@ -20,18 +26,20 @@ class GenieAcsConfig:
 
 
 class GenieAcsClient:
-    def __init__(self, *, config: GenieAcsConfig, http: httpx.AsyncClient) -> None:
+    def __init__(self, *, config: GenieAcsConfig, http: httpx.AsyncClient, max_concurrency: int = 10) -> None:
         self._config = config
         self._http = http
+        self._sem = asyncio.Semaphore(max_concurrency)
 
     async def find_device(self, *, query_obj: dict[str, Any], projection: Optional[list[str]] = None) -> dict[str, Any]:
-        query = json.dumps(query_obj, separators=(",", ":"))
+        query = orjson.dumps(query_obj).decode()
         params: dict[str, Any] = {"query": query}
         if projection:
             params["projection"] = ",".join(projection)
-        resp = await self._http.get("/devices", params=params)
+        async with self._sem:
+            resp = await self._http.get("/devices", params=params)
         resp.raise_for_status()
-        data = resp.json()
+        data = orjson.loads(resp.content)
         if not isinstance(data, list) or not data:
             raise GenieAcsError("Device tidak ditemukan di GenieACS")
         if not isinstance(data[0], dict):
@@ -50,6 +58,7 @@ class GenieAcsClient:
         device_id: str,
         parameter_values: list[list[Any]],
         connection_request: bool = True,
+        parse_body: bool = False,
     ) -> tuple[int, dict[str, Any]]:
         did = (device_id or "").strip()
         if not did:
@@ -58,11 +67,16 @@ class GenieAcsClient:
         if connection_request:
             params["connection_request"] = ""
         payload = {"name": "setParameterValues", "parameterValues": parameter_values}
-        did_enc = urllib.parse.quote(did, safe="")
-        resp = await self._http.post(f"/devices/{did_enc}/tasks", params=params, json=payload)
+        did_enc = did if _URL_SAFE_ID.fullmatch(did) else urllib.parse.quote(did, safe="")
+        async with self._sem:
+            resp = await self._http.post(
+                f"/devices/{did_enc}/tasks", params=params, content=orjson.dumps(payload), headers=_JSON_HEADERS
+            )
         resp.raise_for_status()
+        if not parse_body:
+            return resp.status_code, {}
         try:
-            body = resp.json()
+            body = orjson.loads(resp.content)
         except Exception:
             body = {}
         if not isinstance(body, dict):
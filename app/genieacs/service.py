@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from functools import partial
 from typing import Any, Optional
 
 from app.genieacs.client import GenieAcsClient, GenieAcsError
+from app.util.cache import TTLCacheBox
 
 
 @dataclass(frozen=True)
@@ -12,10 +14,14 @@ class WifiParams:
     password_path: str = "InternetGatewayDevice.LANDevice.1.WLANConfiguration.1.KeyPassphrase"
 
 
+_DEVICE_PROJECTION = ["_id", "VirtualParameters"]
+
+
 class GenieAcsService:
     def __init__(self, client: GenieAcsClient) -> None:
         self._client = client
         self._wifi = WifiParams()
+        self._recent_devices: TTLCacheBox = TTLCacheBox(maxsize=256, ttl=10)
 
     @property
     def wifi(self) -> WifiParams:
@@ -31,17 +37,23 @@ class GenieAcsService:
         return None
 
     @staticmethod
-    def _get_path(device: dict[str, Any], path: str) -> Any:
+    def _get_path(device: dict[str, Any], parts: tuple[str, ...]) -> Any:
         cur: Any = device
-        for part in path.split("."):
+        for part in parts:
             if not isinstance(cur, dict):
                 return None
             cur = cur.get(part)
         return cur
 
+    async def _get_device(self, device_id: str) -> dict[str, Any]:
+        return await self._recent_devices.get_or_set(
+            device_id,
+            partial(self._client.find_device_by_id, device_id, projection=_DEVICE_PROJECTION),
+        )
+
     async def get_virtual_param(self, *, device_id: str, name: str) -> str:
-        dev = await self._client.find_device_by_id(device_id)
-        node = self._get_path(dev, f"VirtualParameters.{name}")
+        dev = await self._get_device(device_id)
+        node = self._get_path(dev, ("VirtualParameters", name))
         value = self._get_value(node)
         if value is None or not value.strip():
             raise GenieAcsError(f"Virtual parameter {name} tidak ditemukan")
@@ -51,10 +63,14 @@ class GenieAcsService:
         pu = (pppoe_username or "").strip()
         if not pu:
             raise GenieAcsError("pppoe_username kosong")
-        dev = await self._client.find_device(query_obj={"VirtualParameters.pppoeUsername._value": pu})
+        dev = await self._client.find_device(
+            query_obj={"VirtualParameters.pppoeUsername._value": pu},
+            projection=_DEVICE_PROJECTION,
+        )
         device_id = str(dev.get("_id") or "").strip()
         if not device_id:
             raise GenieAcsError("DeviceID tidak ditemukan di data GenieACS")
+        self._recent_devices.set(device_id, dev)
         return device_id
 
     async def set_wifi_ssid(self, *, device_id: str, ssid: str) -> int:
@@ -1,12 +1,18 @@
 from __future__ import annotations
 
 import asyncio
+import hmac
 import logging
 import time
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from functools import partial
+from typing import Awaitable, Callable, Optional
 
+import anyio.to_thread
 import httpx
-from fastapi import BackgroundTasks, FastAPI, Header, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from pydantic import ValidationError
 
 from app.commands.handlers import BotContext, BotReply, CallbackResult, handle_callback, handle_command
 from app.commands.parser import parse_command
@@ -18,7 +24,7 @@ from app.nuxbill.client import NuxBillClient
 from app.nuxbill.service import NuxBillService
 from app.security.rate_limit import RateLimiter
 from app.settings import load_settings
-from app.storage.audit import AuditStore, make_event
+from app.storage.audit import AuditEvent, AuditStore, make_event, run_audit_writer
 from app.storage.pending import PendingStore
 from app.telegram.client import TelegramClient
 from app.telegram.models import Update
@@ -33,31 +39,40 @@ app = FastAPI(title="Telegram PPPoE Bot (NuxBill)")
 logger = logging.getLogger("telegram_pppoe_bot")
 
 _DENY_TEXT = "Akses ditolak."
+_OK_BODY = b'{"ok":true}'
 
 
-def _is_allowed_user(settings, user_id: Optional[int]) -> bool:
-    allowed = settings.allowed_user_ids()
+def _ok() -> Response:
+    return Response(content=_OK_BODY, media_type="application/json")
+
+
+def _is_allowed_user(allowed: frozenset[int], user_id: Optional[int]) -> bool:
     if not allowed:
         return True
-    if user_id is None:
-        return False
-    return int(user_id) in allowed
+    return user_id is not None and user_id in allowed
 
 
 @app.on_event("startup")
 async def _startup() -> None:
     settings = load_settings()
     _setup_logging(settings.log_level)
+    app.state.executor = ThreadPoolExecutor(max_workers=settings.thread_pool_size, thread_name_prefix="bot")
+    asyncio.get_running_loop().set_default_executor(app.state.executor)
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.thread_pool_size
 
-    limits = httpx.Limits(max_keepalive_connections=20, max_connections=50)
+    limits = httpx.Limits(max_keepalive_connections=50, max_connections=200, keepalive_expiry=300.0)
     timeout = httpx.Timeout(connect=3.0, read=5.0, write=5.0, pool=3.0)
-    http = httpx.AsyncClient(limits=limits, timeout=timeout)
+    http = httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(http2=True, limits=limits, retries=0),
+        timeout=timeout,
+        headers={"User-Agent": "telegram-pppoe-bot"},
+    )
 
-    nux_http = httpx.AsyncClient(limits=limits, timeout=timeout)
     if settings.genieacs_enabled():
         genie_http = httpx.AsyncClient(
             base_url=settings.genieacs_base_url.rstrip("/"),
             auth=(settings.genieacs_username, settings.genieacs_password),
+            http2=True,
             limits=limits,
             timeout=timeout,
         )
@@ -65,8 +80,8 @@ async def _startup() -> None:
         genie_http = httpx.AsyncClient(limits=limits, timeout=timeout)
 
     app.state.settings = settings
+    app.state.allowed_user_ids = frozenset(settings.allowed_user_ids())
     app.state.http = http
-    app.state.nux_http = nux_http
     app.state.genie_http = genie_http
     app.state.telegram = TelegramClient(bot_token=settings.telegram_bot_token, http=http)
     app.state.nuxbill = NuxBillService(
@@ -74,7 +89,7 @@ async def _startup() -> None:
             api_url=settings.nuxbill_api_url,
             username=settings.nuxbill_username,
             password=settings.nuxbill_password,
-            http=nux_http,
+            http=http,
         )
     )
     app.state.mikrotik = None
@@ -111,16 +126,92 @@ async def _startup() -> None:
     )
     app.state.audit = AuditStore(settings.audit_db_path)
     await app.state.audit.init()
+    app.state.audit_queue = asyncio.Queue(maxsize=10_000)
+    app.state.audit_task = asyncio.create_task(run_audit_writer(app.state.audit, app.state.audit_queue))
+    app.state.work_queue = asyncio.Queue(maxsize=2000)
+    app.state.workers = [asyncio.create_task(_worker(app.state.work_queue)) for _ in range(settings.worker_count)]
+    app.state.warmup_task = asyncio.create_task(
+        _warm_up(http, ["https://api.telegram.org/", settings.nuxbill_api_url])
+    )
+    app.state.ctx_proto = BotContext(
+        nuxbill=app.state.nuxbill,
+        activate_using=settings.nuxbill_activate_using,
+        mikrotik=app.state.mikrotik,
+        genieacs=app.state.genieacs,
+        pending=app.state.pending,
+    )
 
 
 @app.on_event("shutdown")
 async def _shutdown() -> None:
+    warmup_task: asyncio.Task[None] = app.state.warmup_task
+    warmup_task.cancel()
+    await asyncio.gather(warmup_task, return_exceptions=True)
+    work_queue: asyncio.Queue[Callable[[], Awaitable[None]]] = app.state.work_queue
+    try:
+        async with asyncio.timeout(10.0):
+            await work_queue.join()
+    except TimeoutError:
+        logger.warning("work queue not drained on shutdown (%d jobs pending)", work_queue.qsize())
+    workers: list[asyncio.Task[None]] = app.state.workers
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    audit_queue: asyncio.Queue[AuditEvent] = app.state.audit_queue
+    try:
+        async with asyncio.timeout(5.0):
+            await audit_queue.join()
+    except TimeoutError:
+        logger.warning("audit queue not drained on shutdown (%d events pending)", audit_queue.qsize())
+    audit_task: asyncio.Task[None] = app.state.audit_task
+    audit_task.cancel()
+    await asyncio.gather(audit_task, return_exceptions=True)
+    await app.state.audit.aclose()
+    mikrotik: Optional[MikrotikService] = app.state.mikrotik
+    if mikrotik is not None:
+        await mikrotik.aclose()
     http: httpx.AsyncClient = app.state.http
-    nux_http: httpx.AsyncClient = app.state.nux_http
     genie_http: httpx.AsyncClient = app.state.genie_http
     await http.aclose()
-    await nux_http.aclose()
     await genie_http.aclose()
+    executor: ThreadPoolExecutor = app.state.executor
+    executor.shutdown(wait=False)
+
+
+async def _warm_up(http: httpx.AsyncClient, urls: list[str]) -> None:
+    async def _one(url: str) -> None:
+        try:
+            await http.head(url)
+        except Exception as exc:
+            logger.info("connection warm-up failed url=%s exc=%r", url, exc)
+
+    await asyncio.gather(*(_one(url) for url in urls if url))
+
+
+async def _worker(queue: asyncio.Queue[Callable[[], Awaitable[None]]]) -> None:
+    while True:
+        job = await queue.get()
+        try:
+            await job()
+        except Exception:
+            logger.exception("background job failed")
+        finally:
+            queue.task_done()
+
+
+def _submit(job: Callable[[], Awaitable[None]]) -> None:
+    try:
+        app.state.work_queue.put_nowait(job)
+    except asyncio.QueueFull:
+        logger.warning("work queue full, asking Telegram to retry")
+        raise HTTPException(status_code=503, detail="busy") from None
+
+
+def _audit(event: AuditEvent) -> None:
+    try:
+        app.state.audit_queue.put_nowait(event)
+    except asyncio.QueueFull:
+        logger.warning("audit queue full, dropping event command=%s", event.command)
 
 
 @retry_telegram()
@@ -162,35 +253,124 @@ async def _answer_callback(callback_query_id: str, text: Optional[str]) -> None:
     await telegram.answer_callback_query(callback_query_id=callback_query_id, text=text)
 
 
+def _ctx(chat_id: int, user_id: Optional[int]) -> BotContext:
+    proto: BotContext = app.state.ctx_proto
+    return replace(proto, chat_id=chat_id, user_id=user_id)
+
+
+async def _process_command(
+    *,
+    chat_id: int,
+    message_id: int,
+    user_id: Optional[int],
+    name: str,
+    args: list[str],
+    audit_args: str,
+    timeout_text: str,
+    start_ns: int,
+) -> None:
+    try:
+        async with asyncio.timeout(9.0):
+            reply = await handle_command(_ctx(chat_id, user_id), name, args)
+        ok = True
+    except TimeoutError:
+        reply = BotReply(timeout_text)
+        ok = False
+    except Exception:
+        reply = BotReply("Terjadi kesalahan internal.")
+        ok = False
+
+    try:
+        await _send_telegram(
+            chat_id,
+            message_id,
+            reply.text,
+            reply_markup=reply.reply_markup,
+            parse_mode=reply.parse_mode,
+        )
+    finally:
+        _audit(
+            make_event(
+                chat_id=chat_id,
+                user_id=user_id,
+                command=name,
+                args=audit_args,
+                ok=ok,
+                message=reply.text[:4000],
+                start_ns=start_ns,
+            )
+        )
+
+
+async def _process_callback(
+    *,
+    cb_id: str,
+    chat_id: int,
+    message_id: int,
+    user_id: Optional[int],
+    data: str,
+    start_ns: int,
+) -> None:
+    try:
+        async with asyncio.timeout(9.0):
+            result = await handle_callback(_ctx(chat_id, user_id), data)
+        ok = True
+    except TimeoutError:
+        result = CallbackResult("Timeout saat memproses. Coba lagi.", answer="Timeout")
+        ok = False
+    except Exception:
+        result = CallbackResult("Terjadi kesalahan internal.", answer="Error")
+        ok = False
+
+    try:
+        await _answer_callback(cb_id, result.answer)
+        await _edit_telegram(
+            chat_id,
+            message_id,
+            result.text,
+            reply_markup=result.reply_markup,
+            parse_mode=result.parse_mode,
+        )
+    finally:
+        _audit(
+            make_event(
+                chat_id=chat_id,
+                user_id=user_id,
+                command="callback",
+                args=data[:500],
+                ok=ok,
+                message=result.text[:4000],
+                start_ns=start_ns,
+            )
+        )
+
+
 @app.post("/webhook")
 async def webhook(
-    update: Update,
-    background: BackgroundTasks,
+    request: Request,
     x_telegram_bot_api_secret_token: Optional[str] = Header(
         default=None, alias="X-Telegram-Bot-Api-Secret-Token"
     ),
-) -> dict[str, bool]:
+) -> Response:
     settings = app.state.settings
-    if x_telegram_bot_api_secret_token != settings.telegram_webhook_secret:
+    if not hmac.compare_digest(
+        (x_telegram_bot_api_secret_token or "").encode("utf-8"),
+        settings.telegram_webhook_secret.encode("utf-8"),
+    ):
         logger.warning("webhook rejected: invalid secret")
         raise HTTPException(status_code=401, detail="invalid secret")
 
-    def _ctx(chat_id: int, user_id: Optional[int]) -> BotContext:
-        return BotContext(
-            nuxbill=app.state.nuxbill,
-            activate_using=settings.nuxbill_activate_using,
-            mikrotik=app.state.mikrotik,
-            genieacs=app.state.genieacs,
-            pending=app.state.pending,
-            chat_id=chat_id,
-            user_id=user_id,
-        )
+    try:
+        update = Update.model_validate_json(await request.body())
+    except ValidationError:
+        raise HTTPException(status_code=422, detail="invalid update") from None
 
     if update.callback_query and isinstance(update.callback_query, dict):
         cb = update.callback_query
         cb_id = str(cb.get("id") or "")
         cb_from = cb.get("from") or {}
-        user_id = cb_from.get("id")
+        raw_user_id = cb_from.get("id")
+        user_id = raw_user_id if isinstance(raw_user_id, int) else None
         msg_obj = cb.get("message") or {}
         chat_obj = msg_obj.get("chat") or {}
         chat_id = chat_obj.get("id")
@@ -198,158 +378,88 @@ async def webhook(
         data = cb.get("data")
 
         if not cb_id or not isinstance(chat_id, int) or not isinstance(message_id, int) or not isinstance(data, str):
-            return {"ok": True}
+            return _ok()
 
-        if not _is_allowed_user(settings, user_id if isinstance(user_id, int) else None):
-            background.add_task(_answer_callback, cb_id, _DENY_TEXT)
-            return {"ok": True}
+        if not _is_allowed_user(app.state.allowed_user_ids, user_id):
+            _submit(partial(_answer_callback, cb_id, _DENY_TEXT))
+            return _ok()
 
-        key = f"{chat_id}:{user_id}"
         limiter: RateLimiter = app.state.rate_limiter
-        if not limiter.allow(key):
-            background.add_task(_answer_callback, cb_id, "Rate limit. Coba lagi sebentar.")
-            return {"ok": True}
-
-        start_ts = time.time()
-
-        async def _process_cb() -> None:
-            try:
-                result = await asyncio.wait_for(handle_callback(_ctx(chat_id, user_id if isinstance(user_id, int) else None), data), timeout=9.0)
-                ok = True
-            except asyncio.TimeoutError:
-                result = CallbackResult("Timeout saat memproses. Coba lagi.", answer="Timeout")
-                ok = False
-            except Exception:
-                result = CallbackResult("Terjadi kesalahan internal.", answer="Error")
-                ok = False
-
-            try:
-                await _answer_callback(cb_id, result.answer)
-                await _edit_telegram(
-                    chat_id,
-                    message_id,
-                    result.text,
-                    reply_markup=result.reply_markup,
-                    parse_mode=getattr(result, "parse_mode", None),
-                )
-            finally:
-                audit: AuditStore = app.state.audit
-                ev = make_event(
-                    chat_id=chat_id,
-                    user_id=user_id if isinstance(user_id, int) else None,
-                    command="callback",
-                    args=data[:500],
-                    ok=ok,
-                    message=result.text[:4000],
-                    start_ts=start_ts,
-                )
-                await audit.write(ev)
-
-        background.add_task(_process_cb)
-        return {"ok": True}
+        if not limiter.allow(PendingStore.key(chat_id, user_id)):
+            _submit(partial(_answer_callback, cb_id, "Rate limit. Coba lagi sebentar."))
+            return _ok()
+
+        _submit(
+            partial(
+                _process_callback,
+                cb_id=cb_id,
+                chat_id=chat_id,
+                message_id=message_id,
+                user_id=user_id,
+                data=data,
+                start_ns=time.perf_counter_ns(),
+            )
+        )
+        return _ok()
 
     msg = update.get_message()
     if not msg or not msg.text:
-        return {"ok": True}
+        return _ok()
 
     user_id = msg.from_user.id if msg.from_user else None
-    if not _is_allowed_user(settings, user_id):
-        background.add_task(_send_telegram, msg.chat.id, msg.message_id, _DENY_TEXT, reply_markup=None)
-        return {"ok": True}
+    if not _is_allowed_user(app.state.allowed_user_ids, user_id):
+        _submit(partial(_send_telegram, msg.chat.id, msg.message_id, _DENY_TEXT, reply_markup=None))
+        return _ok()
 
-    key = f"{msg.chat.id}:{user_id}"
+    key = PendingStore.key(msg.chat.id, user_id)
     limiter: RateLimiter = app.state.rate_limiter
     if not limiter.allow(key):
         logger.info("rate_limited chat_id=%s user_id=%s", msg.chat.id, user_id)
-        background.add_task(_send_telegram, msg.chat.id, msg.message_id, "Rate limit. Coba lagi sebentar.", reply_markup=None)
-        return {"ok": True}
+        _submit(partial(_send_telegram, msg.chat.id, msg.message_id, "Rate limit. Coba lagi sebentar.", reply_markup=None))
+        return _ok()
 
     pending: PendingStore = app.state.pending
     pending_entry = pending.get_by_chat(key)
     if pending_entry and not msg.text.strip().startswith("/"):
         action_id, _ = pending_entry
-        start_ts = time.time()
-
-        async def _process_pending() -> None:
-            text = msg.text.strip()
-            try:
-                reply = await asyncio.wait_for(handle_command(_ctx(msg.chat.id, user_id), "pending_input", [action_id, text]), timeout=9.0)
-                ok = True
-            except asyncio.TimeoutError:
-                reply = BotReply("Timeout saat memproses. Coba lagi.")
-                ok = False
-            except Exception:
-                reply = BotReply("Terjadi kesalahan internal.")
-                ok = False
-
-            try:
-                await _send_telegram(
-                    msg.chat.id,
-                    msg.message_id,
-                    reply.text,
-                    reply_markup=reply.reply_markup,
-                    parse_mode=getattr(reply, "parse_mode", None),
-                )
-            finally:
-                audit: AuditStore = app.state.audit
-                ev = make_event(
-                    chat_id=msg.chat.id,
-                    user_id=user_id,
-                    command="pending_input",
-                    args="",
-                    ok=ok,
-                    message=reply.text[:4000],
-                    start_ts=start_ts,
-                )
-                await audit.write(ev)
-
-        background.add_task(_process_pending)
-        return {"ok": True}
-
-    parsed = parse_command(msg.text)
-    if not parsed:
-        return {"ok": True}
-
-    start_ts = time.time()
-
-    async def _process() -> None:
-        logger.info(
-            "command chat_id=%s user_id=%s name=%s args=%s",
-            msg.chat.id,
-            user_id,
-            parsed.name,
-            " ".join(parsed.args),
-        )
-        try:
-            reply = await asyncio.wait_for(handle_command(_ctx(msg.chat.id, user_id), parsed.name, parsed.args), timeout=9.0)
-            ok = True
-        except asyncio.TimeoutError:
-            reply = BotReply("Timeout saat memproses perintah. Coba lagi.")
-            ok = False
-        except Exception:
-            reply = BotReply("Terjadi kesalahan internal.")
-            ok = False
-
-        try:
-            await _send_telegram(
-                msg.chat.id,
-                msg.message_id,
-                reply.text,
-                reply_markup=reply.reply_markup,
-                parse_mode=getattr(reply, "parse_mode", None),
-            )
-        finally:
-            audit: AuditStore = app.state.audit
-            ev = make_event(
+        _submit(
+            partial(
+                _process_command,
                 chat_id=msg.chat.id,
+                message_id=msg.message_id,
                 user_id=user_id,
-                command=parsed.name,
-                args=" ".join(parsed.args),
-                ok=ok,
-                message=reply.text[:4000],
-                start_ts=start_ts,
+                name="pending_input",
+                args=[action_id, msg.text.strip()],
+                audit_args="",
+                timeout_text="Timeout saat memproses. Coba lagi.",
+                start_ns=time.perf_counter_ns(),
             )
-            await audit.write(ev)
+        )
+        return _ok()
 
-    background.add_task(_process)
-    return {"ok": True}
+    parsed = parse_command(msg.text)
+    if not parsed:
+        return _ok()
+
+    args_joined = " ".join(parsed.args)
+    logger.info(
+        "command chat_id=%s user_id=%s name=%s args=%s",
+        msg.chat.id,
+        user_id,
+        parsed.name,
+        args_joined,
+    )
+    _submit(
+        partial(
+            _process_command,
+            chat_id=msg.chat.id,
+            message_id=msg.message_id,
+            user_id=user_id,
+            name=parsed.name,
+            args=parsed.args,
+            audit_args=args_joined,
+            timeout_text="Timeout saat memproses perintah. Coba lagi.",
+            start_ns=time.perf_counter_ns(),
+        )
+    )
+    return _ok()
@@ -3,6 +3,26 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Any, Optional
 
+from cachetools import TTLCache
+
+from app.util.circuit import CircuitBreaker
+
+try:
+    import routeros_api
+    from routeros_api.exceptions import (
+        RouterOsApiCommunicationError,
+        RouterOsApiConnectionError,
+        RouterOsApiError,
+        RouterOsApiFatalCommunicationError,
+    )
+except ImportError:
+    routeros_api = None
+    _ROUTEROS_ERRORS: tuple[type[BaseException], ...] = (OSError,)
+    _CONNECTION_ERRORS: tuple[type[BaseException], ...] = (OSError,)
+else:
+    _ROUTEROS_ERRORS = (OSError, RouterOsApiError)
+    _CONNECTION_ERRORS = (OSError, RouterOsApiConnectionError, RouterOsApiFatalCommunicationError)
+
 
 class MikrotikError(RuntimeError):
     pass
@@ -19,6 +39,10 @@ class MikrotikConfig:
 class MikrotikClient:
     def __init__(self, config: MikrotikConfig) -> None:
         self._config = config
+        self._rule_ids: TTLCache = TTLCache(maxsize=128, ttl=600)
+        self._pool: Any = None
+        self._nat: Any = None
+        self._breaker = CircuitBreaker()
 
     def ensure_onu_forward_rule(
         self,
@@ -38,10 +62,61 @@ class MikrotikClient:
         if not to_address.strip():
             raise MikrotikError("IP customer tidak ditemukan")
 
+        payload = {
+            "chain": "dstnat",
+            "protocol": "tcp",
+            "dst_address": ip_public.strip(),
+            "dst_port": str(int(port_onu)),
+            "action": "dst-nat",
+            "to_addresses": to_address.strip(),
+            "to_ports": str(int(to_port)),
+            "comment": comment.strip(),
+            "disabled": "no",
+        }
+        result = {"comment": comment.strip(), "dst": f"{ip_public.strip()}:{int(port_onu)}"}
+
+        if not self._breaker.allow():
+            raise MikrotikError("Mikrotik sedang bermasalah, coba lagi nanti")
+        try:
+            action = self._apply_with_reconnect(comment, payload)
+        except MikrotikError as exc:
+            if isinstance(exc.__cause__, Exception) and _is_connection_error(exc.__cause__):
+                self._breaker.record_failure()
+            else:
+                self._breaker.record_success()
+            raise
+        self._breaker.record_success()
+        return {"action": action, **result}
+
+    def _apply_with_reconnect(self, comment: str, payload: dict[str, str]) -> str:
+        reused = self._nat is not None
+        try:
+            return self._apply(self._get_nat(), comment, payload)
+        except _ROUTEROS_ERRORS as exc:
+            self.close()
+            if not (reused and _is_connection_error(exc)):
+                raise MikrotikError(str(exc)) from exc
         try:
-            import routeros_api
-        except Exception as exc:
-            raise MikrotikError("Library routeros-api belum terpasang") from exc
+            return self._apply(self._get_nat(), comment, payload)
+        except _ROUTEROS_ERRORS as exc:
+            self.close()
+            raise MikrotikError(str(exc)) from exc
+
+    def close(self) -> None:
+        pool = self._pool
+        self._pool = None
+        self._nat = None
+        if pool is not None:
+            try:
+                pool.disconnect()
+            except _ROUTEROS_ERRORS:
+                pass
+
+    def _get_nat(self) -> Any:
+        if self._nat is not None:
+            return self._nat
+        if routeros_api is None:
+            raise MikrotikError("Library routeros-api belum terpasang")
 
         pool = routeros_api.RouterOsApiPool(
             self._config.host,
@@ -51,37 +126,54 @@ class MikrotikClient:
             plaintext_login=True,
         )
         try:
-            api = pool.get_api()
-            nat = api.get_resource("/ip/firewall/nat")
-            found = nat.get(comment=comment)
-            rule_id: Optional[str] = None
-            if isinstance(found, list) and found:
-                first = found[0]
-                if isinstance(first, dict):
-                    rule_id = str(first.get("id") or first.get(".id") or "")
-                    if not rule_id:
-                        rule_id = None
-
-            payload = {
-                "chain": "dstnat",
-                "protocol": "tcp",
-                "dst_address": ip_public.strip(),
-                "dst_port": str(int(port_onu)),
-                "action": "dst-nat",
-                "to_addresses": to_address.strip(),
-                "to_ports": str(int(to_port)),
-                "comment": comment.strip(),
-                "disabled": "no",
-            }
-
-            if rule_id is None:
-                nat.add(**payload)
-                action = "created"
-            else:
-                nat.set(id=rule_id, **payload)
-                action = "updated"
-            return {"action": action, "comment": comment.strip(), "dst": f"{ip_public.strip()}:{int(port_onu)}"}
-        except Exception as exc:
-            raise MikrotikError(str(exc)) from exc
-        finally:
-            pool.disconnect()
+            nat = pool.get_api().get_resource("/ip/firewall/nat")
+        except _ROUTEROS_ERRORS:
+            try:
+                pool.disconnect()
+            except _ROUTEROS_ERRORS:
+                pass
+            raise
+        self._pool = pool
+        self._nat = nat
+        return nat
+
+    def _apply(self, nat: Any, comment: str, payload: dict[str, str]) -> str:
+        cached_id = self._rule_ids.get(comment)
+        if cached_id is not None:
+            try:
+                nat.set(id=cached_id, **payload)
+                return "updated"
+            except RouterOsApiCommunicationError as exc:
+                if not _is_missing_item(exc):
+                    raise
+                self._rule_ids.pop(comment, None)
+
+        rule_id = self._find_rule_id(nat, comment)
+        if rule_id is None:
+            added = nat.add(**payload)
+            new_id = str(getattr(added, "done_message", {}).get("ret") or "")
+            if new_id:
+                self._rule_ids[comment] = new_id
+            return "created"
+        nat.set(id=rule_id, **payload)
+        self._rule_ids[comment] = rule_id
+        return "updated"
+
+    @staticmethod
+    def _find_rule_id(nat: Any, comment: str) -> Optional[str]:
+        found = nat.get(comment=comment)
+        if isinstance(found, list) and found:
+            first = found[0]
+            if isinstance(first, dict):
+                rule_id = str(first.get("id") or first.get(".id") or "")
+                if rule_id:
+                    return rule_id
+        return None
+
+
+def _is_connection_error(exc: BaseException) -> bool:
+    return isinstance(exc, _CONNECTION_ERRORS)
+
+
+def _is_missing_item(exc: RouterOsApiCommunicationError) -> bool:
+    return b"no such item" in (exc.original_message or b"")
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import partial
 from typing import Any
 
 from app.mikrotik.client import MikrotikClient, MikrotikConfig
@@ -18,18 +20,26 @@ class MikrotikService:
     def __init__(self, *, mikrotik: MikrotikConfig, onu: RemoteOnuConfig) -> None:
         self._client = MikrotikClient(mikrotik)
         self._onu = onu
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mikrotik")
 
     @property
     def onu(self) -> RemoteOnuConfig:
         return self._onu
 
     async def ensure_onu_forward(self, *, to_address: str, to_port: int = 80) -> dict[str, Any]:
-        return await asyncio.to_thread(
-            self._client.ensure_onu_forward_rule,
-            ip_public=self._onu.ip_public,
-            port_onu=self._onu.port_onu,
-            comment=self._onu.comment_firewall,
-            to_address=to_address,
-            to_port=to_port,
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            partial(
+                self._client.ensure_onu_forward_rule,
+                ip_public=self._onu.ip_public,
+                port_onu=self._onu.port_onu,
+                comment=self._onu.comment_firewall,
+                to_address=to_address,
+                to_port=to_port,
+            ),
         )
 
+    async def aclose(self) -> None:
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._client.close)
+        self._executor.shutdown(wait=False)
+
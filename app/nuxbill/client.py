@@ -1,12 +1,15 @@
 from __future__ import annotations
 
+import asyncio
 import time
 from dataclasses import dataclass
 from typing import Any, Optional
 
 import httpx
+import orjson
 
-from app.util.retry import retry_nuxbill
+from app.util.circuit import CircuitBreaker
+from app.util.retry import is_transient_httpx, retry_nuxbill
 
 
 class NuxBillError(RuntimeError):
@@ -32,20 +35,23 @@ class NuxBillClient:
         username: str,
         password: str,
         http: httpx.AsyncClient,
+        max_concurrency: int = 10,
     ) -> None:
         self._api_url = api_url.rstrip("/")
         self._username = username
         self._password = password
         self._http = http
+        self._sem = asyncio.Semaphore(max_concurrency)
         self._token: Optional[NuxBillToken] = None
+        self._breaker = CircuitBreaker()
 
     @staticmethod
     def _parse_token_time(token: str) -> Optional[int]:
-        parts = token.split(".")
-        if len(parts) != 4:
+        if token.count(".") != 3:
             return None
+        second = token.find(".", token.find(".") + 1)
         try:
-            return int(parts[2])
+            return int(token[second + 1 : token.find(".", second + 1)])
         except ValueError:
             return None
 
@@ -54,21 +60,38 @@ class NuxBillClient:
         q = {"r": r}
         if params:
             q.update(params)
-        resp = await self._http.post(self._api_url, params=q, data=data)
+        async with self._sem:
+            resp = await self._http.post(self._api_url, params=q, data=data)
         resp.raise_for_status()
-        return resp.json()
+        return orjson.loads(resp.content)
 
-    @retry_nuxbill()
     async def _request(self, method: str, *, r: str, params: Optional[dict[str, Any]] = None, data: Optional[dict[str, Any]] = None) -> dict[str, Any]:
+        if not self._breaker.allow():
+            raise NuxBillError("NuxBill sedang bermasalah, coba lagi nanti")
+        try:
+            payload = await self._send_request(method, r=r, params=params, data=data)
+        except BaseException as exc:
+            if is_transient_httpx(exc):
+                self._breaker.record_failure()
+            elif isinstance(exc, Exception):
+                self._breaker.record_success()
+            else:
+                self._breaker.release()
+            raise
+        self._breaker.record_success()
+        return payload
+
+    @retry_nuxbill()
+    async def _send_request(self, method: str, *, r: str, params: Optional[dict[str, Any]] = None, data: Optional[dict[str, Any]] = None) -> dict[str, Any]:
         token = await self.get_token()
         q = {"r": r, "token": token}
         if params:
             q.update(params)
 
-        req = self._http.build_request(method, self._api_url, params=q, data=data)
-        resp = await self._http.send(req)
+        async with self._sem:
+            resp = await self._http.request(method, self._api_url, params=q, data=data)
         resp.raise_for_status()
-        return resp.json()
+        return orjson.loads(resp.content)
 
     async def get_token(self) -> str:
         if self._token and not self._token.is_expired():
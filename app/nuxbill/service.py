@@ -1,15 +1,18 @@
 from __future__ import annotations
 
 import asyncio
-from dataclasses import dataclass
-from typing import Any, Optional
+from dataclasses import dataclass, field
+from functools import partial
+from operator import attrgetter
+from typing import Any, Callable, Iterator, Optional
 
 from cachetools import TTLCache
 
 from app.nuxbill.client import NuxBillClient, NuxBillError
+from app.util.cache import TTLCacheBox
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Customer:
     id: int
     username: str
@@ -19,7 +22,7 @@ class Customer:
     pppoe_username: Optional[str]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Package:
     id: int
     plan_id: int
@@ -29,9 +32,25 @@ class Package:
     routers: Optional[str]
     expiration: Optional[str]
     time: Optional[str]
+    type_upper: str = field(init=False, repr=False, compare=False)
+    status_lower: str = field(init=False, repr=False, compare=False)
 
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "type_upper", self.type.upper())
+        object.__setattr__(self, "status_lower", self.status.lower())
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
+class ParsedPackages:
+    packages: list[Package]
+    active_pppoe: Optional[Package]
+    last_pppoe: Optional[Package]
+
+    def pick_pppoe(self) -> Optional[Package]:
+        return self.active_pppoe or self.last_pppoe
+
+
+@dataclass(frozen=True, slots=True)
 class Plan:
     id: int
     name_plan: str
@@ -47,58 +66,82 @@ class Plan:
         return "radius"
 
 
+_PARSED_VIEWS: TTLCache = TTLCache(maxsize=1000, ttl=30)
+
+
+_BY_ID = attrgetter("id")
+
+
+def _memo_view(kind: str, view: dict[str, Any], parse: Callable[[dict[str, Any]], Any]) -> Any:
+    key = (kind, id(view))
+    hit = _PARSED_VIEWS.get(key)
+    if hit is not None and hit[0] is view:
+        return hit[1]
+    value = parse(view)
+    _PARSED_VIEWS[key] = (view, value)
+    return value
+
+
 class NuxBillService:
     def __init__(self, client: NuxBillClient) -> None:
         self._client = client
-        self._cache_customers_list: TTLCache = TTLCache(maxsize=200, ttl=15)
-        self._cache_customer_view: TTLCache = TTLCache(maxsize=500, ttl=30)
-        self._cache_pppoe_plans_search: TTLCache = TTLCache(maxsize=200, ttl=300)
-        self._cache_pppoe_plans_list: TTLCache = TTLCache(maxsize=200, ttl=60)
+        self._cache_customers_list: TTLCacheBox = TTLCacheBox(maxsize=200, ttl=15)
+        self._cache_customer_view: TTLCacheBox = TTLCacheBox(maxsize=500, ttl=30)
+        self._cache_pppoe_plans_search: TTLCacheBox = TTLCacheBox(maxsize=200, ttl=300)
+        self._cache_pppoe_plans_list: TTLCacheBox = TTLCacheBox(maxsize=200, ttl=60)
+        self._cache_usernames: TTLCacheBox = TTLCacheBox(maxsize=2000, ttl=3600)
 
     async def list_customers(self, *, status_filter: str, search: str = "", page: int = 1) -> list[dict[str, Any]]:
-        cache_key = f"customers:{status_filter}:{search}:{page}"
-        cached = self._cache_customers_list.get(cache_key)
-        if cached is not None:
-            return cached
+        async def _fetch() -> list[dict[str, Any]]:
+            payload = await self._client.get(
+                r="customers",
+                params={"filter": status_filter, "search": search, "order": "username", "orderby": "asc", "p": page},
+            )
+            self._client.require_success(payload)
+            result = payload.get("result") or {}
+            customers = result.get("d") or []
+            if not isinstance(customers, list):
+                customers = []
+            return customers
 
-        payload = await self._client.get(
-            r="customers",
-            params={"filter": status_filter, "search": search, "order": "username", "orderby": "asc", "p": page},
-        )
-        self._client.require_success(payload)
-        result = payload.get("result") or {}
-        customers = result.get("d") or []
-        if not isinstance(customers, list):
-            customers = []
-        self._cache_customers_list[cache_key] = customers
-        return customers
+        return await self._cache_customers_list.get_or_set(("customers", status_filter, search, page), _fetch)
 
     async def get_customer_view_by_username(self, username: str) -> dict[str, Any]:
-        cache_key = f"customer_viewu:{username}"
-        cached = self._cache_customer_view.get(cache_key)
-        if cached is not None:
-            return cached
+        async def _fetch() -> dict[str, Any]:
+            payload = await self._client.get(r=f"customers/viewu/{username}")
+            self._client.require_success(payload)
+            return payload.get("result") or {}
 
-        payload = await self._client.get(r=f"customers/viewu/{username}")
-        self._client.require_success(payload)
-        result = payload.get("result") or {}
-        self._cache_customer_view[cache_key] = result
-        return result
+        return await self._cache_customer_view.get_or_set(("customer_viewu", username), _fetch)
 
     async def get_customer_view_by_id(self, customer_id: int) -> dict[str, Any]:
-        cache_key = f"customer_view:{customer_id}"
-        cached = self._cache_customer_view.get(cache_key)
-        if cached is not None:
-            return cached
+        return await self._cache_customer_view.get_or_set(
+            ("customer_view", customer_id),
+            partial(self._fetch_customer_view_by_id, customer_id),
+        )
 
+    async def _fetch_customer_view_by_id(self, customer_id: int) -> dict[str, Any]:
         payload = await self._client.get(r=f"customers/view/{customer_id}/activation")
         self._client.require_success(payload)
         result = payload.get("result") or {}
-        self._cache_customer_view[cache_key] = result
+        d = result.get("d")
+        if isinstance(d, dict) and d.get("username"):
+            self._cache_usernames.set(customer_id, str(d["username"]))
         return result
 
+    async def get_customer_username(self, customer_id: int) -> str:
+        cached = self._cache_usernames.get(customer_id)
+        if cached is not None:
+            return cached
+        view = await self.get_customer_view_by_id(customer_id)
+        return self.parse_customer(view).username
+
     @staticmethod
     def parse_customer(view_result: dict[str, Any]) -> Customer:
+        return _memo_view("customer", view_result, NuxBillService._parse_customer)
+
+    @staticmethod
+    def _parse_customer(view_result: dict[str, Any]) -> Customer:
         d = view_result.get("d") or {}
         try:
             return Customer(
@@ -113,81 +156,77 @@ class NuxBillService:
             raise NuxBillError(f"Format data customer tidak dikenali: {exc!r}") from exc
 
     @staticmethod
-    def parse_packages(view_result: dict[str, Any]) -> list[Package]:
+    def _iter_packages(view_result: dict[str, Any]) -> Iterator[Package]:
         pkgs_raw = view_result.get("packages") or []
         if not isinstance(pkgs_raw, list):
-            return []
-        pkgs: list[Package] = []
+            return
         for item in pkgs_raw:
             if not isinstance(item, dict):
                 continue
+            get = item.get
             try:
-                pkgs.append(
-                    Package(
-                        id=int(item.get("id") or 0),
-                        plan_id=int(item.get("plan_id") or 0),
-                        type=str(item.get("type") or ""),
-                        namebp=(item.get("namebp") or None),
-                        status=str(item.get("status") or ""),
-                        routers=(item.get("routers") or None),
-                        expiration=(item.get("expiration") or None),
-                        time=(item.get("time") or None),
-                    )
+                yield Package(
+                    id=int(get("id") or 0),
+                    plan_id=int(get("plan_id") or 0),
+                    type=str(get("type") or ""),
+                    namebp=(get("namebp") or None),
+                    status=str(get("status") or ""),
+                    routers=(get("routers") or None),
+                    expiration=(get("expiration") or None),
+                    time=(get("time") or None),
                 )
             except Exception:
                 continue
-        pkgs.sort(key=lambda p: p.id, reverse=True)
+
+    @classmethod
+    def parse_packages(cls, view_result: dict[str, Any]) -> list[Package]:
+        pkgs = list(cls._iter_packages(view_result))
+        pkgs.sort(key=_BY_ID, reverse=True)
         return pkgs
 
+    @classmethod
+    def parse_pppoe_packages(cls, view_result: dict[str, Any]) -> ParsedPackages:
+        return _memo_view("pppoe_packages", view_result, cls._parse_pppoe_packages)
+
+    @classmethod
+    def _parse_pppoe_packages(cls, view_result: dict[str, Any]) -> ParsedPackages:
+        pkgs: list[Package] = []
+        active: Optional[Package] = None
+        last: Optional[Package] = None
+        for p in cls._iter_packages(view_result):
+            pkgs.append(p)
+            if p.type_upper != "PPPOE":
+                continue
+            if last is None or p.id > last.id:
+                last = p
+            if p.status_lower == "on" and (active is None or p.id > active.id):
+                active = p
+        pkgs.sort(key=_BY_ID, reverse=True)
+        return ParsedPackages(packages=pkgs, active_pppoe=active, last_pppoe=last)
+
     @staticmethod
     def pick_active_pppoe_package(packages: list[Package]) -> Optional[Package]:
         for p in packages:
-            if p.type.upper() == "PPPOE" and p.status.lower() == "on":
+            if p.type_upper == "PPPOE" and p.status_lower == "on":
                 return p
         for p in packages:
-            if p.type.upper() == "PPPOE":
+            if p.type_upper == "PPPOE":
                 return p
         return None
 
     async def search_pppoe_plans(self, query: str) -> list[Plan]:
-        cache_key = f"pppoe_plans:{query.lower()}"
-        cached = self._cache_pppoe_plans_search.get(cache_key)
-        if cached is not None:
-            return cached
-
-        payload = await self._client.get(r="services/pppoe", params={"name": query, "p": 1})
-        self._client.require_success(payload)
-        result = payload.get("result") or {}
-        plans_raw = result.get("d") or []
-        plans: list[Plan] = []
-        if isinstance(plans_raw, list):
-            for item in plans_raw:
-                if not isinstance(item, dict):
-                    continue
-                if str(item.get("type") or "").upper() != "PPPOE":
-                    continue
-                try:
-                    plans.append(
-                        Plan(
-                            id=int(item.get("id") or 0),
-                            name_plan=str(item.get("name_plan") or ""),
-                            routers=(item.get("routers") or None),
-                            is_radius=(int(item["is_radius"]) if item.get("is_radius") is not None else None),
-                            type=(item.get("type") or None),
-                        )
-                    )
-                except Exception:
-                    continue
-
-        self._cache_pppoe_plans_search[cache_key] = plans
-        return plans
+        return await self._cache_pppoe_plans_search.get_or_set(
+            ("pppoe_plans", query.lower()),
+            partial(self._fetch_pppoe_plans, name=query, page=1),
+        )
 
     async def list_pppoe_plans(self, *, page: int = 1, name: str = "") -> list[Plan]:
-        cache_key = f"pppoe_plans_list:{page}:{name.lower()}"
-        cached = self._cache_pppoe_plans_list.get(cache_key)
-        if cached is not None:
-            return cached
+        return await self._cache_pppoe_plans_list.get_or_set(
+            ("pppoe_plans_list", page, name.lower()),
+            partial(self._fetch_pppoe_plans, name=name, page=page),
+        )
 
+    async def _fetch_pppoe_plans(self, *, name: str, page: int) -> list[Plan]:
         payload = await self._client.get(r="services/pppoe", params={"name": name, "p": page})
         self._client.require_success(payload)
         result = payload.get("result") or {}
@@ -211,7 +250,6 @@ class NuxBillService:
                     )
                 except Exception:
                     continue
-        self._cache_pppoe_plans_list[cache_key] = plans
         return plans
 
     async def find_pppoe_plan_best_match(self, query: str) -> Plan:
@@ -231,12 +269,21 @@ class NuxBillService:
 
         return plans[0]
 
+    def invalidate_customer(self, customer_id: int) -> None:
+        self._cache_customer_view.pop(("customer_view", customer_id))
+        for key, view in self._cache_customer_view.items():
+            d = view.get("d") if isinstance(view, dict) else None
+            if isinstance(d, dict) and str(d.get("id") or "") == str(customer_id):
+                self._cache_customer_view.pop(key)
+        self._cache_customers_list.clear()
+
     async def recharge(self, *, customer_id: int, plan: Plan, using: str) -> None:
         payload = await self._client.post_form(
             r="plan/recharge-post",
             data={"id_customer": customer_id, "server": plan.server_name(), "plan": plan.id, "using": using, "svoucher": ""},
         )
         self._client.require_success(payload)
+        self.invalidate_customer(customer_id)
 
     async def recharge_by_plan_id(self, *, customer_id: int, plan_id: int, server: str, using: str) -> None:
         payload = await self._client.post_form(
@@ -244,14 +291,17 @@ class NuxBillService:
             data={"id_customer": customer_id, "server": server, "plan": plan_id, "using": using, "svoucher": ""},
         )
         self._client.require_success(payload)
+        self.invalidate_customer(customer_id)
 
     async def deactivate(self, *, customer_id: int, plan_id: int) -> None:
         payload = await self._client.get(r=f"customers/deactivate/{customer_id}/{plan_id}")
         self._client.require_success(payload)
+        self.invalidate_customer(customer_id)
 
     async def sync(self, *, customer_id: int) -> None:
         payload = await self._client.get(r=f"customers/sync/{customer_id}")
         self._client.require_success(payload)
+        self.invalidate_customer(customer_id)
 
     async def get_pppoe_customers_page_with_packages(
         self,
@@ -262,11 +312,9 @@ class NuxBillService:
         time_budget_sec: float = 8.0,
     ) -> list[tuple[Customer, Optional[Package]]]:
         async def _inner() -> list[tuple[Customer, Optional[Package]]]:
-            customers_active = await self.list_customers(status_filter="Active", page=page)
-            customers_inactive: list[dict[str, Any]] = []
+            customers_raw = await self.list_customers(status_filter="Active", page=page)
             if include_inactive:
-                customers_inactive = await self.list_customers(status_filter="Inactive", page=page)
-            customers_raw = customers_active + customers_inactive
+                customers_raw = customers_raw + await self.list_customers(status_filter="Inactive", page=page)
 
             pppoe_customers = []
             for c in customers_raw:
@@ -285,15 +333,10 @@ class NuxBillService:
                 async with sem:
                     view = await self.get_customer_view_by_id(cid)
                     cust = self.parse_customer(view)
-                    pkgs = self.parse_packages(view)
-                    pkg = self.pick_active_pppoe_package(pkgs)
+                    pkg = self.parse_pppoe_packages(view).pick_pppoe()
                     return cust, pkg
 
-            tasks = [_fetch(cid) for cid in pppoe_customers]
-            results: list[tuple[Customer, Optional[Package]]] = []
-            if tasks:
-                for coro in asyncio.as_completed(tasks):
-                    results.append(await coro)
+            results = list(await asyncio.gather(*(_fetch(cid) for cid in pppoe_customers)))
             results.sort(key=lambda x: x[0].username.lower())
             return results
 
@@ -1,34 +1,52 @@
 from __future__ import annotations
 
 import time
-from collections import deque
+from array import array
 from dataclasses import dataclass
-from typing import Deque, Dict
+from typing import Dict, Hashable
+
+_SWEEP_EVERY = 1000
+
+
+@dataclass(slots=True)
+class _Ring:
+    stamps: array
+    head: int = 0
 
 
 @dataclass
 class RateLimiter:
     max_requests: int
     window_sec: int
-    _buckets: Dict[str, Deque[float]]
+    _buckets: Dict[Hashable, _Ring]
+    _calls: int = 0
 
     @classmethod
     def create(cls, *, max_requests: int, window_sec: int) -> "RateLimiter":
         return cls(max_requests=max_requests, window_sec=window_sec, _buckets={})
 
-    def allow(self, key: str) -> bool:
-        now = time.time()
-        bucket = self._buckets.get(key)
-        if bucket is None:
-            bucket = deque()
-            self._buckets[key] = bucket
-
-        cutoff = now - self.window_sec
-        while bucket and bucket[0] < cutoff:
-            bucket.popleft()
-
-        if len(bucket) >= self.max_requests:
+    def allow(self, key: Hashable) -> bool:
+        if self.max_requests <= 0:
             return False
-
-        bucket.append(now)
+        now = time.monotonic()
+        self._calls += 1
+        if self._calls % _SWEEP_EVERY == 0:
+            self._sweep(now)
+
+        ring = self._buckets.get(key)
+        if ring is None:
+            ring = _Ring(array("d", [float("-inf")]) * self.max_requests)
+            self._buckets[key] = ring
+
+        head = ring.head
+        if now - ring.stamps[head] < self.window_sec:
+            return False
+        ring.stamps[head] = now
+        ring.head = (head + 1) % self.max_requests
         return True
+
+    def _sweep(self, now: float) -> None:
+        cutoff = now - 2 * self.window_sec
+        stale = [key for key, ring in self._buckets.items() if ring.stamps[ring.head - 1] < cutoff]
+        for key in stale:
+            del self._buckets[key]
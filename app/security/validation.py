@@ -3,12 +3,12 @@ from __future__ import annotations
 import re
 
 
-_USERNAME_RE = re.compile(r"^[A-Za-z0-9:+_.@-]{2,55}$")
+_USERNAME_RE = re.compile(r"[A-Za-z0-9:+_.@-]{2,55}")
 
 
 def validate_username(value: str) -> str:
     v = value.strip()
-    if not _USERNAME_RE.match(v):
+    if not _USERNAME_RE.fullmatch(v):
         raise ValueError("Username tidak valid")
     return v
 
@@ -22,9 +22,9 @@ def validate_plan_query(value: str) -> str:
 
 def validate_page(value: str) -> int:
     v = value.strip()
-    if not v.isdigit():
+    if not (v.isascii() and v.isdigit()):
         raise ValueError("Page harus angka")
     page = int(v)
-    if page < 1 or page > 9999:
+    if not 1 <= page <= 9999:
         raise ValueError("Page tidak valid")
     return page
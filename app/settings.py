@@ -34,6 +34,8 @@ class Settings(BaseSettings):
 
     audit_db_path: str = "./audit.db"
     log_level: str = "INFO"
+    thread_pool_size: int = 64
+    worker_count: int = 32
 
     def allowed_user_ids(self) -> set[int]:
         raw = (self.telegram_allowed_user_ids or "").strip()
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 from pathlib import Path
 import time
 from dataclasses import dataclass
@@ -7,6 +9,8 @@ from typing import Optional
 
 import aiosqlite
 
+logger = logging.getLogger("telegram_pppoe_bot")
+
 
 @dataclass(frozen=True)
 class AuditEvent:
@@ -23,39 +27,52 @@ class AuditEvent:
 class AuditStore:
     def __init__(self, db_path: str) -> None:
         self._db_path = db_path
+        self._db: Optional[aiosqlite.Connection] = None
 
     async def init(self) -> None:
         db_path = Path(self._db_path)
         if db_path.parent and str(db_path.parent) not in (".", ""):
             db_path.parent.mkdir(parents=True, exist_ok=True)
-        async with aiosqlite.connect(self._db_path) as db:
-            await db.execute(
-                """
-                CREATE TABLE IF NOT EXISTS bot_activity (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    ts REAL NOT NULL,
-                    chat_id INTEGER NOT NULL,
-                    user_id INTEGER NULL,
-                    command TEXT NOT NULL,
-                    args TEXT NOT NULL,
-                    ok INTEGER NOT NULL,
-                    message TEXT NOT NULL,
-                    latency_ms INTEGER NOT NULL
-                )
-                """
+        db = await aiosqlite.connect(self._db_path)
+        await db.execute("PRAGMA journal_mode=WAL")
+        await db.execute("PRAGMA synchronous=NORMAL")
+        await db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bot_activity (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts REAL NOT NULL,
+                chat_id INTEGER NOT NULL,
+                user_id INTEGER NULL,
+                command TEXT NOT NULL,
+                args TEXT NOT NULL,
+                ok INTEGER NOT NULL,
+                message TEXT NOT NULL,
+                latency_ms INTEGER NOT NULL
             )
-            await db.commit()
+            """
+        )
+        await db.commit()
+        self._db = db
+
+    async def aclose(self) -> None:
+        db = self._db
+        self._db = None
+        if db is not None:
+            await db.close()
 
     async def write(self, event: AuditEvent) -> None:
-        db_path = Path(self._db_path)
-        if db_path.parent and str(db_path.parent) not in (".", ""):
-            db_path.parent.mkdir(parents=True, exist_ok=True)
-        async with aiosqlite.connect(self._db_path) as db:
-            await db.execute(
-                """
-                INSERT INTO bot_activity (ts, chat_id, user_id, command, args, ok, message, latency_ms)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """,
+        await self.write_many([event])
+
+    async def write_many(self, events: list[AuditEvent]) -> None:
+        db = self._db
+        if db is None:
+            raise RuntimeError("AuditStore belum diinisialisasi")
+        await db.executemany(
+            """
+            INSERT INTO bot_activity (ts, chat_id, user_id, command, args, ok, message, latency_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
                 (
                     event.ts,
                     event.chat_id,
@@ -65,9 +82,25 @@ class AuditStore:
                     1 if event.ok else 0,
                     event.message,
                     event.latency_ms,
-                ),
-            )
-            await db.commit()
+                )
+                for event in events
+            ],
+        )
+        await db.commit()
+
+
+async def run_audit_writer(store: AuditStore, queue: asyncio.Queue[AuditEvent], *, batch_size: int = 64) -> None:
+    while True:
+        batch = [await queue.get()]
+        while len(batch) < batch_size and not queue.empty():
+            batch.append(queue.get_nowait())
+        try:
+            await store.write_many(batch)
+        except Exception:
+            logger.exception("audit write failed (%d events dropped)", len(batch))
+        finally:
+            for _ in batch:
+                queue.task_done()
 
 
 def make_event(
@@ -78,9 +111,9 @@ def make_event(
     args: str,
     ok: bool,
     message: str,
-    start_ts: float,
+    start_ns: int,
 ) -> AuditEvent:
-    latency_ms = int((time.time() - start_ts) * 1000)
+    latency_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
     return AuditEvent(
         ts=time.time(),
         chat_id=chat_id,
@@ -5,6 +5,8 @@ from typing import Optional
 
 from cachetools import TTLCache
 
+ChatKey = tuple[int, Optional[int]]
+
 
 @dataclass
 class PendingAction:
@@ -23,8 +25,8 @@ class PendingStore:
         self._by_chat: TTLCache = TTLCache(maxsize=2000, ttl=300)
 
     @staticmethod
-    def key(chat_id: int, user_id: Optional[int]) -> str:
-        return f"{chat_id}:{user_id}"
+    def key(chat_id: int, user_id: Optional[int]) -> ChatKey:
+        return (chat_id, user_id)
 
     @staticmethod
     def _new_id() -> str:
@@ -32,13 +34,13 @@ class PendingStore:
 
         return secrets.token_urlsafe(8)
 
-    def start(self, *, chat_key: str, action: PendingAction) -> str:
+    def start(self, *, chat_key: ChatKey, action: PendingAction) -> str:
         action_id = self._new_id()
         self._by_id[action_id] = action
         self._by_chat[chat_key] = action_id
         return action_id
 
-    def get_by_chat(self, chat_key: str) -> Optional[tuple[str, PendingAction]]:
+    def get_by_chat(self, chat_key: ChatKey) -> Optional[tuple[str, PendingAction]]:
         action_id = self._by_chat.get(chat_key)
         if not isinstance(action_id, str) or not action_id:
             return None
@@ -60,7 +62,7 @@ class PendingStore:
         if action_id in self._by_id:
             del self._by_id[action_id]
 
-    def clear_chat(self, chat_key: str) -> None:
+    def clear_chat(self, chat_key: ChatKey) -> None:
         existing = self._by_chat.get(chat_key)
         if isinstance(existing, str) and existing:
             self.delete_by_id(existing)
@@ -1,19 +1,32 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any, Optional
 
 import httpx
+import orjson
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
 
 
 @dataclass(frozen=True)
 class TelegramClient:
-    bot_token: str
+    bot_token: str = field(repr=False)
     http: httpx.AsyncClient
+    _send_url: str = field(init=False, repr=False)
+    _edit_url: str = field(init=False, repr=False)
+    _answer_url: str = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        base_url = f"https://api.telegram.org/bot{self.bot_token}"
+        object.__setattr__(self, "_send_url", f"{base_url}/sendMessage")
+        object.__setattr__(self, "_edit_url", f"{base_url}/editMessageText")
+        object.__setattr__(self, "_answer_url", f"{base_url}/answerCallbackQuery")
 
-    @property
-    def _base_url(self) -> str:
-        return f"https://api.telegram.org/bot{self.bot_token}"
+    async def _post(self, url: str, payload: dict[str, Any]) -> dict[str, Any]:
+        resp = await self.http.post(url, content=orjson.dumps(payload), headers=_JSON_HEADERS)
+        resp.raise_for_status()
+        return orjson.loads(resp.content)
 
     async def send_message(
         self,
@@ -36,10 +49,7 @@ class TelegramClient:
             payload["reply_markup"] = reply_markup
         if parse_mode is not None:
             payload["parse_mode"] = parse_mode
-
-        resp = await self.http.post(f"{self._base_url}/sendMessage", json=payload)
-        resp.raise_for_status()
-        return resp.json()
+        return await self._post(self._send_url, payload)
 
     async def edit_message_text(
         self,
@@ -61,9 +71,7 @@ class TelegramClient:
             payload["reply_markup"] = reply_markup
         if parse_mode is not None:
             payload["parse_mode"] = parse_mode
-        resp = await self.http.post(f"{self._base_url}/editMessageText", json=payload)
-        resp.raise_for_status()
-        return resp.json()
+        return await self._post(self._edit_url, payload)
 
     async def answer_callback_query(
         self,
@@ -78,6 +86,5 @@ class TelegramClient:
         }
         if text:
             payload["text"] = text
-        resp = await self.http.post(f"{self._base_url}/answerCallbackQuery", json=payload)
-        resp.raise_for_status()
-        return resp.json()
+        return await self._post(self._answer_url, payload)
+
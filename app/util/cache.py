@@ -1,28 +1,82 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Callable, Generic, Optional, TypeVar
-
-from cachetools import TTLCache
+import asyncio
+import time
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Awaitable, Callable, Generic, Optional, TypeVar
 
 K = TypeVar("K")
 V = TypeVar("V")
 
 
+@dataclass(slots=True)
+class _Flight(Generic[V]):
+    future: asyncio.Future[V]
+    waiters: int = 0
+
+
 @dataclass
 class TTLCacheBox(Generic[K, V]):
-    cache: TTLCache
+    maxsize: int
+    ttl: float
+    _store: dict[K, tuple[V, float]] = field(default_factory=dict)
+    _inflight: dict[K, _Flight[V]] = field(default_factory=dict)
 
     def get(self, key: K) -> Optional[V]:
-        return self.cache.get(key)
+        entry = self._store.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() > entry[1]:
+            self._store.pop(key, None)
+            return None
+        return entry[0]
 
     def set(self, key: K, value: V) -> None:
-        self.cache[key] = value
+        store = self._store
+        store.pop(key, None)
+        now = time.monotonic()
+        if len(store) >= self.maxsize:
+            for expired in [k for k, (_, expires) in store.items() if expires < now]:
+                del store[expired]
+        while len(store) >= self.maxsize:
+            del store[next(iter(store))]
+        store[key] = (value, now + self.ttl)
+
+    def items(self) -> list[tuple[K, V]]:
+        now = time.monotonic()
+        return [(key, value) for key, (value, expires) in self._store.items() if expires >= now]
 
-    async def get_or_set(self, key: K, factory: Callable[[], V]) -> V:
+    def pop(self, key: K) -> None:
+        self._store.pop(key, None)
+        self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        self._store.clear()
+        self._inflight.clear()
+
+    async def get_or_set(self, key: K, factory: Callable[[], Awaitable[V]]) -> V:
         existing = self.get(key)
         if existing is not None:
             return existing
-        value = factory()
-        self.set(key, value)
-        return value
+
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(factory()))
+            self._inflight[key] = flight
+            flight.future.add_done_callback(partial(self._finish, key, flight))
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.future)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.future.done():
+                flight.future.cancel()
+
+    def _finish(self, key: K, flight: _Flight[V], fut: asyncio.Future[V]) -> None:
+        ok = not fut.cancelled() and fut.exception() is None
+        if self._inflight.get(key) is not flight:
+            return
+        del self._inflight[key]
+        if ok:
+            self.set(key, fut.result())
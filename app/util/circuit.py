@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class CircuitBreaker:
+    failure_threshold: int = 5
+    cooldown_sec: float = 30.0
+    state: str = "closed"
+    failures: int = 0
+    successes: int = 0
+    rejected: int = 0
+    opened_at: float = 0.0
+    _probing: bool = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.cooldown_sec:
+                self.rejected += 1
+                return False
+            self.state = "half_open"
+            self._probing = False
+        if self._probing:
+            self.rejected += 1
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.successes += 1
+        self.failures = 0
+        self.state = "closed"
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self) -> None:
+        self._probing = False
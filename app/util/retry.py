@@ -1,38 +1,85 @@
 from __future__ import annotations
 
-from tenacity import (
-    RetryCallState,
-    retry,
-    retry_if_exception,
-    stop_after_attempt,
-    wait_exponential_jitter,
-)
+import asyncio
+import logging
+import random
+from functools import wraps
+from typing import Any, Awaitable, Callable, TypeVar
 
+import httpx
 
-def _is_retryable_httpx(exc: BaseException) -> bool:
-    import httpx
+logger = logging.getLogger("telegram_pppoe_bot")
 
-    return isinstance(exc, (httpx.TimeoutException, httpx.NetworkError))
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
 
+_RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+_TRANSIENT_ERRORS = (httpx.TimeoutException, httpx.NetworkError)
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+_SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+_MAX_RETRY_AFTER = 2.0
 
-def retry_nuxbill():
-    return retry(
-        retry=retry_if_exception(_is_retryable_httpx),
-        stop=stop_after_attempt(3),
-        wait=wait_exponential_jitter(initial=0.2, max=1.0),
-        reraise=True,
-    )
 
+def is_transient_httpx(exc: BaseException) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in _RETRYABLE_STATUS
+    return isinstance(exc, _TRANSIENT_ERRORS)
 
-def retry_telegram():
-    return retry(
-        retry=retry_if_exception(_is_retryable_httpx),
-        stop=stop_after_attempt(3),
-        wait=wait_exponential_jitter(initial=0.2, max=1.0),
-        reraise=True,
-    )
 
+def is_retryable_httpx(exc: BaseException) -> bool:
+    if isinstance(exc, _NOT_SENT_ERRORS):
+        return True
+    if not is_transient_httpx(exc):
+        return False
+    return _request_method(exc) in _SAFE_METHODS
 
-def format_retry_log(retry_state: RetryCallState) -> str:
-    exc = retry_state.outcome.exception() if retry_state.outcome else None
-    return f"attempt={retry_state.attempt_number} exc={exc!r}"
+
+def _request_method(exc: BaseException) -> str:
+    try:
+        return exc.request.method  # type: ignore[attr-defined]
+    except (AttributeError, RuntimeError):
+        return ""
+
+
+def _retry_after(exc: BaseException | None) -> float | None:
+    if not isinstance(exc, httpx.HTTPStatusError) or exc.response.status_code != 429:
+        return None
+    try:
+        seconds = float(exc.response.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+    return min(max(seconds, 0.0), _MAX_RETRY_AFTER)
+
+
+def _backoff(attempt: int, *, initial: float, cap: float) -> float:
+    return min(cap, initial * 2**attempt) * (0.5 + random.random() * 0.5)
+
+
+def retry_httpx(*, attempts: int = 3, initial: float = 0.2, cap: float = 1.0) -> Callable[[F], F]:
+    def decorator(fn: F) -> F:
+        @wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            attempt = 0
+            while True:
+                try:
+                    return await fn(*args, **kwargs)
+                except Exception as exc:
+                    attempt += 1
+                    if attempt >= attempts or not is_retryable_httpx(exc):
+                        raise
+                    delay = _retry_after(exc)
+                    if delay is None:
+                        delay = _backoff(attempt - 1, initial=initial, cap=cap)
+                    logger.info("retry %s attempt=%d exc=%r", fn.__qualname__, attempt, exc)
+                    await asyncio.sleep(delay)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def retry_nuxbill() -> Callable[[F], F]:
+    return retry_httpx()
+
+
+def retry_telegram() -> Callable[[F], F]:
+    return retry_httpx()
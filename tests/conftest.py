@@ -0,0 +1,114 @@
+import os
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Optional
+
+import httpx
+import pytest
+import pytest_asyncio
+import routeros_api
+
+from app.nuxbill.client import NuxBillClient
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def nuxbill_client():
+    api_url = os.getenv("NUXBILL_API_URL")
+    username = os.getenv("NUXBILL_USERNAME")
+    password = os.getenv("NUXBILL_PASSWORD")
+    if not api_url or not username or not password:
+        pytest.skip("env NUXBILL_* belum diset")
+
+    timeout = httpx.Timeout(connect=5.0, read=10.0, write=10.0, pool=5.0)
+    limits = httpx.Limits(max_keepalive_connections=10)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as http:
+        yield NuxBillClient(api_url=api_url, username=username, password=password, http=http)
+
+
+_NUXBILL_TOKEN = "a.1.1700000000.x"
+
+
+@pytest.fixture
+def mock_nuxbill_client():
+    @asynccontextmanager
+    async def _open(handler: Callable[[httpx.Request], Awaitable[httpx.Response]], **kwargs):
+        async def _with_login(request: httpx.Request) -> httpx.Response:
+            if request.url.params.get("r") == "admin/post":
+                return httpx.Response(200, json={"success": True, "result": {"token": _NUXBILL_TOKEN}})
+            return await handler(request)
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(_with_login)) as http:
+            yield NuxBillClient(api_url="https://example.com/system/api.php", username="u", password="p", http=http, **kwargs)
+
+    return _open
+
+
+class _AddResponse(list):
+    def __init__(self, rule_id: Optional[str]) -> None:
+        super().__init__()
+        self.done_message = {"ret": rule_id} if rule_id else {}
+
+
+class _FakeNat:
+    def __init__(self, pool: "_FakePool") -> None:
+        self.pool = pool
+        self.router = pool.router
+
+    def _call(self, name: str) -> None:
+        if self.pool.broken:
+            raise routeros_api.exceptions.RouterOsApiConnectionClosedError("closed")
+        self.router.calls.append(name)
+
+    def get(self, **kwargs):
+        self._call("get")
+        return [{"id": self.router.rule_id}] if self.router.rule_id else []
+
+    def set(self, **kwargs):
+        self._call(f"set:{kwargs['id']}")
+        if self.router.set_error is not None:
+            raise self.router.set_error
+
+    def add(self, **kwargs):
+        self._call("add")
+        return _AddResponse(self.router.added_id)
+
+
+class _FakeApi:
+    def __init__(self, pool: "_FakePool") -> None:
+        self.pool = pool
+
+    def get_resource(self, path):
+        return _FakeNat(self.pool)
+
+
+class _FakePool:
+    def __init__(self, router: "FakeRouter") -> None:
+        self.router = router
+        self.broken = False
+        self.disconnected = False
+
+    def get_api(self):
+        return _FakeApi(self)
+
+    def disconnect(self):
+        self.disconnected = True
+
+
+class FakeRouter:
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+        self.pools: list[_FakePool] = []
+        self.rule_id: Optional[str] = None
+        self.added_id: Optional[str] = None
+        self.set_error: Optional[Exception] = None
+
+    def connect(self, *args, **kwargs) -> _FakePool:
+        pool = _FakePool(self)
+        self.pools.append(pool)
+        return pool
+
+
+@pytest.fixture
+def fake_router(monkeypatch):
+    router = FakeRouter()
+    monkeypatch.setattr(routeros_api, "RouterOsApiPool", router.connect)
+    return router
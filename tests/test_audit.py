@@ -0,0 +1,37 @@
+import asyncio
+
+import aiosqlite
+
+from app.storage.audit import AuditStore, make_event, run_audit_writer
+
+
+async def test_audit_writer_flushes_queued_events(tmp_path):
+    db_path = str(tmp_path / "audit.db")
+    store = AuditStore(db_path)
+    await store.init()
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(run_audit_writer(store, queue, batch_size=2))
+    for i in range(5):
+        queue.put_nowait(
+            make_event(chat_id=1, user_id=2, command=f"cmd{i}", args="", ok=True, message="ok", start_ns=0)
+        )
+    await asyncio.wait_for(queue.join(), timeout=5.0)
+    task.cancel()
+    await store.aclose()
+
+    async with aiosqlite.connect(db_path) as db:
+        async with db.execute("SELECT command FROM bot_activity ORDER BY id") as cur:
+            rows = [r[0] for r in await cur.fetchall()]
+    assert rows == [f"cmd{i}" for i in range(5)]
+
+
+async def test_audit_store_uses_wal(tmp_path):
+    store = AuditStore(str(tmp_path / "audit.db"))
+    await store.init()
+    await store.write(make_event(chat_id=1, user_id=None, command="cmd", args="", ok=False, message="x", start_ns=0))
+    async with aiosqlite.connect(str(tmp_path / "audit.db")) as db:
+        async with db.execute("PRAGMA journal_mode") as cur:
+            assert (await cur.fetchone())[0] == "wal"
+        async with db.execute("SELECT COUNT(*) FROM bot_activity") as cur:
+            assert (await cur.fetchone())[0] == 1
+    await store.aclose()
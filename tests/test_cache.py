@@ -0,0 +1,73 @@
+import asyncio
+
+from app.util import cache
+from app.util.cache import TTLCacheBox
+
+
+async def test_get_or_set_runs_factory_once_for_concurrent_misses():
+    box: TTLCacheBox[str, int] = TTLCacheBox(maxsize=10, ttl=60)
+    calls = {"n": 0}
+
+    async def factory() -> int:
+        calls["n"] += 1
+        await asyncio.sleep(0.01)
+        return 42
+
+    values = await asyncio.gather(*(box.get_or_set("k", factory) for _ in range(5)))
+    assert values == [42] * 5
+    assert calls["n"] == 1
+    assert box.get("k") == 42
+    assert await box.get_or_set("k", factory) == 42
+    assert calls["n"] == 1
+
+
+def test_ttl_cache_box_expires_lazily_and_evicts_oldest(monkeypatch):
+    now = {"t": 100.0}
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now["t"])
+    box: TTLCacheBox[str, int] = TTLCacheBox(maxsize=2, ttl=10)
+    box.set("a", 1)
+    box.set("b", 2)
+    box.set("c", 3)
+    assert box.get("a") is None
+    assert box.get("b") == 2
+    now["t"] = 111.0
+    assert box.get("c") is None
+    assert not box._store.get("c")
+
+
+async def test_get_or_set_cancels_factory_only_when_last_waiter_leaves():
+    box: TTLCacheBox[str, int] = TTLCacheBox(maxsize=10, ttl=60)
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def factory() -> int:
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return 1
+
+    first = asyncio.ensure_future(box.get_or_set("k", factory))
+    second = asyncio.ensure_future(box.get_or_set("k", factory))
+    await started.wait()
+    first.cancel()
+    await asyncio.sleep(0)
+    assert not cancelled.is_set()
+    second.cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert "k" not in box._inflight
+
+
+def test_ttl_cache_box_sweeps_expired_entries_before_evicting(monkeypatch):
+    now = {"t": 100.0}
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now["t"])
+    box: TTLCacheBox[str, int] = TTLCacheBox(maxsize=3, ttl=10)
+    box.set("a", 1)
+    box.set("b", 2)
+    now["t"] = 105.0
+    box.set("c", 3)
+    now["t"] = 112.0
+    box.set("d", 4)
+    assert list(box._store) == ["c", "d"]
@@ -0,0 +1,36 @@
+import time
+
+from app.util.circuit import CircuitBreaker
+
+
+def test_circuit_opens_after_threshold_and_probes_after_cooldown():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown_sec=30.0)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+
+    breaker.opened_at = time.monotonic() - 31.0
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    breaker.opened_at = time.monotonic() - 31.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_circuit_release_frees_the_probe_slot():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown_sec=0.0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
@@ -0,0 +1,85 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.genieacs.client import GenieAcsClient, GenieAcsConfig
+from app.genieacs.service import GenieAcsService
+
+
+@pytest.mark.asyncio
+async def test_virtual_param_reuses_device_from_pppoe_lookup():
+    calls = {"devices": 0}
+    device = {
+        "_id": "DEVICEID",
+        "VirtualParameters": {
+            "pppoeUsername": {"_value": "PPPOEUSER"},
+            "IPTR069": {"_value": "172.2.1.37"},
+        },
+    }
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls["devices"] += 1
+        assert request.url.params["projection"] == "_id,VirtualParameters"
+        return httpx.Response(200, json=[device])
+
+    transport = httpx.MockTransport(handler)
+    async with httpx.AsyncClient(transport=transport, base_url="http://acs") as http:
+        config = GenieAcsConfig(base_url="http://acs", username="u", password="p")
+        service = GenieAcsService(GenieAcsClient(config=config, http=http))
+        device_id = await service.resolve_device_id_by_pppoe_username(pppoe_username="PPPOEUSER")
+        ip = await service.get_virtual_param(device_id=device_id, name="IPTR069")
+        assert ip == "172.2.1.37"
+        assert calls["devices"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_virtual_params_share_one_device_fetch():
+    calls = {"devices": 0}
+    device = {
+        "_id": "DEVICEID",
+        "VirtualParameters": {
+            "IPTR069": {"_value": "172.2.1.37"},
+            "RXPower": {"_value": "-20.5"},
+        },
+    }
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls["devices"] += 1
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json=[device])
+
+    transport = httpx.MockTransport(handler)
+    async with httpx.AsyncClient(transport=transport, base_url="http://acs") as http:
+        config = GenieAcsConfig(base_url="http://acs", username="u", password="p")
+        service = GenieAcsService(GenieAcsClient(config=config, http=http))
+        ip, rx = await asyncio.gather(
+            service.get_virtual_param(device_id="DEVICEID", name="IPTR069"),
+            service.get_virtual_param(device_id="DEVICEID", name="RXPower"),
+        )
+        assert (ip, rx) == ("172.2.1.37", "-20.5")
+        await service.get_virtual_param(device_id="DEVICEID", name="IPTR069")
+        assert calls["devices"] == 1
+
+
+@pytest.mark.asyncio
+async def test_set_params_task_sends_orjson_body():
+    seen: dict[str, object] = {}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        seen["path"] = request.url.path
+        seen["content_type"] = request.headers["content-type"]
+        seen["body"] = request.content
+        return httpx.Response(200, json={})
+
+    transport = httpx.MockTransport(handler)
+    async with httpx.AsyncClient(transport=transport, base_url="http://acs") as http:
+        config = GenieAcsConfig(base_url="http://acs", username="u", password="p")
+        client = GenieAcsClient(config=config, http=http)
+        status, _ = await client.post_task_set_params(device_id="DEVICEID", parameter_values=[["a.b", "x", "xsd:string"]])
+        assert status == 200
+        assert seen == {
+            "path": "/devices/DEVICEID/tasks",
+            "content_type": "application/json",
+            "body": b'{"name":"setParameterValues","parameterValues":[["a.b","x","xsd:string"]]}',
+        }
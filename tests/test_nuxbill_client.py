@@ -1,7 +1,11 @@
+import asyncio
+
 import httpx
 import pytest
 
 from app.nuxbill.client import NuxBillClient, NuxBillError
+from app.nuxbill.service import NuxBillService
+from app.util import retry
 
 
 @pytest.mark.asyncio
@@ -32,6 +36,226 @@ async def test_nuxbill_client_login_and_request_adds_token():
         assert calls["customers"] == 1
 
 
+@pytest.mark.asyncio
+async def test_nuxbill_client_caps_concurrent_requests(mock_nuxbill_client):
+    state = {"inflight": 0, "peak": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        state["inflight"] += 1
+        state["peak"] = max(state["peak"], state["inflight"])
+        await asyncio.sleep(0.01)
+        state["inflight"] -= 1
+        return httpx.Response(200, json={"success": True, "result": {"d": []}})
+
+    async with mock_nuxbill_client(handler, max_concurrency=2) as client:
+        await client.get_token()
+        await asyncio.gather(*(client.get(r="customers") for _ in range(6)))
+        assert state["peak"] == 2
+
+
 def test_require_success_raises():
     with pytest.raises(NuxBillError):
         NuxBillClient.require_success({"success": False, "message": "bad"})
+
+
+@pytest.mark.asyncio
+async def test_service_invalidates_customer_view_after_deactivate(mock_nuxbill_client):
+    calls = {"view": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        r = dict(request.url.params).get("r")
+        if r == "customers/view/41/activation":
+            calls["view"] += 1
+            return httpx.Response(200, json={"success": True, "result": {"d": {"id": 41}}})
+        if r == "customers/deactivate/41/7":
+            return httpx.Response(200, json={"success": True, "result": {}})
+        return httpx.Response(404, json={"success": False, "message": "not found"})
+
+    async with mock_nuxbill_client(handler) as client:
+        service = NuxBillService(client)
+        await service.get_customer_view_by_id(41)
+        await service.get_customer_view_by_id(41)
+        assert calls["view"] == 1
+        await service.deactivate(customer_id=41, plan_id=7)
+        await service.get_customer_view_by_id(41)
+        assert calls["view"] == 2
+
+
+@pytest.mark.asyncio
+async def test_service_coalesces_concurrent_customer_view_fetches(mock_nuxbill_client):
+    calls = {"view": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        r = dict(request.url.params).get("r")
+        if r == "customers/view/41/activation":
+            calls["view"] += 1
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"success": True, "result": {"d": {"id": 41, "username": "user1"}}})
+        return httpx.Response(404, json={"success": False, "message": "not found"})
+
+    async with mock_nuxbill_client(handler) as client:
+        service = NuxBillService(client)
+        views = await asyncio.gather(*(service.get_customer_view_by_id(41) for _ in range(3)))
+        assert calls["view"] == 1
+        assert all(v["d"]["username"] == "user1" for v in views)
+
+
+@pytest.mark.asyncio
+async def test_service_coalesces_concurrent_plan_and_list_fetches(mock_nuxbill_client):
+    calls = {"plans": 0, "customers": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        r = dict(request.url.params).get("r")
+        await asyncio.sleep(0.01)
+        if r == "services/pppoe":
+            calls["plans"] += 1
+            return httpx.Response(200, json={"success": True, "result": {"d": [{"id": 7, "name_plan": "10M", "type": "PPPOE"}]}})
+        if r == "customers":
+            calls["customers"] += 1
+            return httpx.Response(200, json={"success": True, "result": {"d": [{"id": 41}]}})
+        return httpx.Response(404, json={"success": False, "message": "not found"})
+
+    async with mock_nuxbill_client(handler) as client:
+        service = NuxBillService(client)
+        await client.get_token()
+        plans = await asyncio.gather(*(service.list_pppoe_plans(page=1) for _ in range(3)))
+        listed = await asyncio.gather(*(service.list_customers(status_filter="Active") for _ in range(3)))
+        assert calls == {"plans": 1, "customers": 1}
+        assert all(p[0].id == 7 for p in plans)
+        assert all(c == [{"id": 41}] for c in listed)
+        await service.list_pppoe_plans(page=1)
+        assert calls["plans"] == 1
+
+
+def test_pick_active_pppoe_package_prefers_on():
+    view = {
+        "packages": [
+            {"id": 1, "plan_id": 10, "type": "pppoe", "status": "On"},
+            {"id": 2, "plan_id": 20, "type": "PPPOE", "status": "off"},
+            {"id": 3, "plan_id": 30, "type": "Hotspot", "status": "on"},
+        ]
+    }
+    pkgs = NuxBillService.parse_packages(view)
+    assert [p.id for p in pkgs] == [3, 2, 1]
+    active = NuxBillService.pick_active_pppoe_package(pkgs)
+    assert active is not None and active.plan_id == 10
+
+
+@pytest.mark.asyncio
+async def test_pppoe_customers_page_fans_out_views(mock_nuxbill_client):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        q = dict(request.url.params)
+        r = q.get("r")
+        if r == "customers":
+            d = [
+                {"id": 2, "username": "bravo", "service_type": "PPPoE"},
+                {"id": 1, "username": "Alpha", "service_type": "PPPoE"},
+                {"id": 3, "username": "hs", "service_type": "Hotspot"},
+            ]
+            return httpx.Response(200, json={"success": True, "result": {"d": d}})
+        if r in ("customers/view/1/activation", "customers/view/2/activation"):
+            cid = int(r.split("/")[2])
+            d = {"id": cid, "username": "Alpha" if cid == 1 else "bravo", "status": "Active"}
+            pkgs = [{"id": cid, "plan_id": 5, "type": "PPPOE", "status": "on"}]
+            return httpx.Response(200, json={"success": True, "result": {"d": d, "packages": pkgs}})
+        return httpx.Response(404, json={"success": False, "message": "not found"})
+
+    async with mock_nuxbill_client(handler) as client:
+        service = NuxBillService(client)
+        rows = await service.get_pppoe_customers_page_with_packages(page=1, include_inactive=False)
+        assert [c.username for c, _ in rows] == ["Alpha", "bravo"]
+        assert all(p is not None and p.plan_id == 5 for _, p in rows)
+
+
+def test_parse_pppoe_packages_matches_pick():
+    view = {
+        "packages": [
+            {"id": 4, "plan_id": 40, "type": "PPPOE", "status": "off"},
+            {"id": 1, "plan_id": 10, "type": "pppoe", "status": "On"},
+            {"id": 2, "plan_id": 20, "type": "PPPOE", "status": "on"},
+            {"id": 5, "plan_id": 50, "type": "Hotspot", "status": "on"},
+        ]
+    }
+    parsed = NuxBillService.parse_pppoe_packages(view)
+    assert [p.id for p in parsed.packages] == [5, 4, 2, 1]
+    assert parsed.active_pppoe is not None and parsed.active_pppoe.plan_id == 20
+    assert parsed.last_pppoe is not None and parsed.last_pppoe.plan_id == 40
+    assert parsed.pick_pppoe() == NuxBillService.pick_active_pppoe_package(parsed.packages)
+
+
+def test_parsed_view_reused_for_same_view_object():
+    view = {"d": {"id": 41, "username": "user1"}, "packages": [{"id": 1, "plan_id": 10, "type": "PPPOE", "status": "on"}]}
+    assert NuxBillService.parse_customer(view) is NuxBillService.parse_customer(view)
+    assert NuxBillService.parse_pppoe_packages(view) is NuxBillService.parse_pppoe_packages(view)
+    other = {"d": {"id": 42, "username": "user2"}}
+    assert NuxBillService.parse_customer(other).username == "user2"
+
+
+@pytest.mark.asyncio
+async def test_nuxbill_client_fails_fast_while_circuit_is_open():
+    calls = {"n": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls["n"] += 1
+        return httpx.Response(200, json={"success": True, "message": "", "result": {"token": "a.1.1700000000.x"}})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        client = NuxBillClient(api_url="https://example.com/system/api.php", username="u", password="p", http=http)
+        for _ in range(5):
+            client._breaker.record_failure()
+        with pytest.raises(NuxBillError):
+            await client.get(r="customers")
+        assert calls["n"] == 0
+
+
+@pytest.mark.asyncio
+async def test_find_pppoe_plan_best_match_prefers_exact_then_shortest(mock_nuxbill_client):
+    plans = [
+        {"id": 1, "name_plan": "Paket 10M Promo", "type": "PPPOE"},
+        {"id": 2, "name_plan": "Paket 10M+", "type": "PPPOE"},
+        {"id": 3, "name_plan": " paket 10m ", "type": "PPPOE"},
+    ]
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        q = dict(request.url.params)
+        if q.get("name") == "paket 10m":
+            return httpx.Response(200, json={"success": True, "result": {"d": plans}})
+        return httpx.Response(200, json={"success": True, "result": {"d": plans[:2]}})
+
+    async with mock_nuxbill_client(handler) as client:
+        service = NuxBillService(client)
+        assert (await service.find_pppoe_plan_best_match("paket 10m")).id == 3
+        assert (await service.find_pppoe_plan_best_match("10M")).id == 2
+
+
+def test_parse_token_time():
+    assert NuxBillClient._parse_token_time("a.1.1700000000.x") == 1700000000
+    assert NuxBillClient._parse_token_time("a.1.1700000000") is None
+    assert NuxBillClient._parse_token_time("a.1.1700000000.x.y") is None
+    assert NuxBillClient._parse_token_time("a.1.abc.x") is None
+
+
+@pytest.mark.asyncio
+async def test_post_form_5xx_is_not_retried_but_get_is(monkeypatch, mock_nuxbill_client):
+    calls = {"recharge": 0, "customers": 0}
+
+    async def no_sleep(delay: float) -> None:
+        return None
+
+    monkeypatch.setattr(retry.asyncio, "sleep", no_sleep)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        r = dict(request.url.params).get("r")
+        if r == "plan/recharge-post":
+            calls["recharge"] += 1
+            return httpx.Response(502)
+        calls["customers"] += 1
+        return httpx.Response(503)
+
+    async with mock_nuxbill_client(handler) as client:
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.post_form(r="plan/recharge-post", data={"id_customer": 41})
+        assert calls["recharge"] == 1
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.get(r="customers")
+        assert calls["customers"] == 3
@@ -23,3 +23,10 @@ def test_parse_command_bot_mention():
 
 def test_parse_command_non_command():
     assert parse_command("hello") is None
+
+
+def test_parse_command_splits_args_on_any_whitespace():
+    cmd = parse_command("/Status@mybot\tuser1  extra")
+    assert cmd is not None
+    assert cmd.name == "status"
+    assert cmd.args == ["user1", "extra"]
@@ -0,0 +1,30 @@
+from app.security import rate_limit
+from app.security.rate_limit import RateLimiter
+
+
+def test_rate_limiter_allows_up_to_max_within_window(monkeypatch):
+    now = {"t": 5.0}
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now["t"])
+    limiter = RateLimiter.create(max_requests=2, window_sec=10)
+    assert limiter.allow("a")
+    assert limiter.allow("a")
+    assert not limiter.allow("a")
+    assert limiter.allow("b")
+
+    now["t"] = 15.5
+    assert limiter.allow("a")
+    assert limiter.allow("a")
+    assert not limiter.allow("a")
+
+
+def test_rate_limiter_sweeps_idle_keys(monkeypatch):
+    now = {"t": 0.0}
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now["t"])
+    monkeypatch.setattr(rate_limit, "_SWEEP_EVERY", 3)
+    limiter = RateLimiter.create(max_requests=5, window_sec=10)
+    limiter.allow("idle")
+    now["t"] = 100.0
+    limiter.allow("busy")
+    limiter.allow("busy")
+    assert "idle" not in limiter._buckets
+    assert "busy" in limiter._buckets
@@ -0,0 +1,138 @@
+from app.commands.handlers import BotContext, handle_callback, handle_command
+from app.nuxbill.client import NuxBillError
+from app.nuxbill.service import Customer, Plan
+
+
+class DummyNuxBill:
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+
+    async def list_customers(self, *, status_filter: str, search: str = "", page: int = 1):
+        self.calls.append("list_customers")
+        return [{"id": 41, "username": "user1", "service_type": "PPPoE"}]
+
+    async def list_pppoe_plans(self, *, page: int = 1, name: str = ""):
+        self.calls.append("list_pppoe_plans")
+        return [Plan(id=7, name_plan="10M", routers=None, is_radius=1, type="PPPOE")]
+
+    async def get_customer_view_by_id(self, customer_id: int):
+        self.calls.append("view")
+        return {"d": {"id": customer_id}}
+
+    async def get_customer_username(self, customer_id: int) -> str:
+        self.calls.append("username")
+        return "user1"
+
+    async def recharge_by_plan_id(self, *, customer_id: int, plan_id: int, server: str, using: str) -> None:
+        self.calls.append(f"recharge:{customer_id}:{plan_id}:{server}:{using}")
+
+    def parse_customer(self, view):
+        return Customer(
+            id=41,
+            username="user1",
+            fullname="Nama 1",
+            status="Active",
+            service_type="PPPoE",
+            pppoe_username="PPPOEUSER",
+        )
+
+
+async def test_recharge_prefetches_plans():
+    nux = DummyNuxBill()
+    ctx = BotContext(nuxbill=nux, activate_using="zero")
+    res = await handle_command(ctx, "recharge", [])
+    assert "pilih customer" in res.text.lower()
+    assert sorted(nux.calls) == ["list_customers", "list_pppoe_plans"]
+    kb = res.reply_markup["inline_keyboard"]
+    assert kb[0][0]["callback_data"] == "rch_selc:41"
+
+
+async def test_recharge_ignores_failed_plan_warm_up():
+    class FailingPlansNuxBill(DummyNuxBill):
+        async def list_pppoe_plans(self, *, page: int = 1, name: str = ""):
+            raise NuxBillError("plans down")
+
+    ctx = BotContext(nuxbill=FailingPlansNuxBill(), activate_using="zero")
+    res = await handle_command(ctx, "recharge", [])
+    assert "pilih customer" in res.text.lower()
+
+
+async def test_recharge_do_success():
+    nux = DummyNuxBill()
+    ctx = BotContext(nuxbill=nux, activate_using="zero")
+    res = await handle_callback(ctx, "rch_do:41:7:cash:1")
+    assert "recharge berhasil" in res.text.lower()
+    assert nux.calls == ["list_pppoe_plans", "recharge:41:7:radius:cash", "username"]
+
+
+async def test_select_customer_fetches_view_and_plans():
+    nux = DummyNuxBill()
+    ctx = BotContext(nuxbill=nux, activate_using="zero")
+    res = await handle_callback(ctx, "rch_selc:41")
+    assert res.text.startswith("Customer: user1")
+    assert sorted(nux.calls) == ["list_pppoe_plans", "view"]
+
+
+async def test_recharge_do_unknown_plan_expired():
+    nux = DummyNuxBill()
+    ctx = BotContext(nuxbill=nux, activate_using="zero")
+    res = await handle_callback(ctx, "rch_do:41:99:cash:1")
+    assert "kadaluarsa" in res.text.lower()
+    assert not any(c.startswith("recharge:") for c in nux.calls)
+
+
+async def test_recharge_do_rejects_non_digit_ids():
+    nux = DummyNuxBill()
+    ctx = BotContext(nuxbill=nux, activate_using="zero")
+    for customer_id in ("+41", "4_1", "٤١"):
+        res = await handle_callback(ctx, f"rch_do:{customer_id}:7:cash:1")
+        assert res.text == "Customer ID harus angka"
+    assert nux.calls == []
+
+
+async def test_recharge_do_uses_server_of_plan_on_page():
+    class PlansNuxBill(DummyNuxBill):
+        async def list_pppoe_plans(self, *, page: int = 1, name: str = ""):
+            self.calls.append(f"list_pppoe_plans:{page}")
+            return [Plan(id=7, name_plan="10M", routers="router-a", is_radius=0, type="PPPOE")]
+
+    nux = PlansNuxBill()
+    ctx = BotContext(nuxbill=nux, activate_using="zero")
+    res = await handle_callback(ctx, "rch_do:41:7:cash:2")
+    assert "recharge berhasil" in res.text.lower()
+    assert nux.calls == ["list_pppoe_plans:2", "recharge:41:7:router-a:cash", "username"]
+
+
+async def test_customer_markup_reused_for_same_cached_page():
+    customers = [{"id": 41, "username": "user1", "service_type": "PPPoE"}]
+
+    class CachedNuxBill(DummyNuxBill):
+        async def list_customers(self, *, status_filter: str, search: str = "", page: int = 1):
+            return customers
+
+    ctx = BotContext(nuxbill=CachedNuxBill(), activate_using="zero")
+    first = await handle_callback(ctx, "rch_c:Active:3")
+    second = await handle_callback(ctx, "rch_c:Active:3")
+    assert second.reply_markup is first.reply_markup
+
+
+async def test_customer_list_markup_filters_pppoe_and_paginates():
+    customers = [{"id": i, "username": f"u{i}", "service_type": "PPPoE"} for i in range(1, 30)]
+    customers.append({"id": 99, "username": "hs", "service_type": "Hotspot"})
+
+    class PagedNuxBill(DummyNuxBill):
+        async def list_customers(self, *, status_filter: str, search: str = "", page: int = 1):
+            return customers
+
+    ctx = BotContext(nuxbill=PagedNuxBill(), activate_using="zero")
+    res = await handle_callback(ctx, "cus_l:Active:2")
+    kb = res.reply_markup["inline_keyboard"]
+    data = [b["callback_data"] for row in kb for b in row]
+    assert "cus_v:1:Active:2" in data
+    assert not any(d.startswith("cus_v:99:") for d in data)
+    assert [len(row) for row in kb[:-2]] == [2] * 14 + [1]
+    assert kb[-2] == [
+        {"text": "⬅️ Prev", "callback_data": "cus_l:Active:1"},
+        {"text": "Next ➡️", "callback_data": "cus_l:Active:3"},
+    ]
+    assert kb[-1] == [{"text": "Tampilkan Inactive", "callback_data": "cus_l:Inactive:1"}]
@@ -1,4 +1,7 @@
+import routeros_api
+
 from app.commands.handlers import BotContext, handle_callback
+from app.mikrotik.client import MikrotikClient, MikrotikConfig
 from app.mikrotik.service import RemoteOnuConfig
 from app.nuxbill.service import Customer
 
@@ -54,3 +57,70 @@ async def test_onu_go_returns_url_button():
     assert isinstance(kb, list)
     assert kb[0][0]["url"] == "http://103.104.1.1:12500"
 
+
+async def test_onu_go_rejects_invalid_iptr069():
+    class BadIpGenieAcs(DummyGenieAcs):
+        async def get_virtual_param(self, *, device_id: str, name: str) -> str:
+            return "not-an-ip"
+
+    ctx = BotContext(nuxbill=DummyNuxBill(), activate_using="zero", mikrotik=DummyMikrotik(), genieacs=BadIpGenieAcs())
+    res = await handle_callback(ctx, "onu_go:41")
+    assert res.text == "IPTR069 tidak valid."
+
+
+_RULE_KWARGS = dict(ip_public="103.104.1.1", port_onu=12500, comment="1. REMOT ONU", to_address="172.2.1.37")
+
+
+def test_mikrotik_client_reuses_nat_rule_id(fake_router):
+    fake_router.rule_id = "*1"
+    client = MikrotikClient(MikrotikConfig(host="h", username="u", password="p"))
+    assert client.ensure_onu_forward_rule(**_RULE_KWARGS)["action"] == "updated"
+    assert client.ensure_onu_forward_rule(**_RULE_KWARGS)["action"] == "updated"
+    assert fake_router.calls == ["get", "set:*1", "set:*1"]
+
+
+def test_mikrotik_client_caches_id_of_added_rule(fake_router):
+    fake_router.added_id = "*2A"
+    client = MikrotikClient(MikrotikConfig(host="h", username="u", password="p"))
+    assert client.ensure_onu_forward_rule(**_RULE_KWARGS)["action"] == "created"
+    assert client.ensure_onu_forward_rule(**_RULE_KWARGS)["action"] == "updated"
+    assert fake_router.calls == ["get", "add", "set:*2A"]
+
+
+def test_mikrotik_client_keeps_connection_and_reconnects(fake_router):
+    client = MikrotikClient(MikrotikConfig(host="h", username="u", password="p"))
+    assert client.ensure_onu_forward_rule(**_RULE_KWARGS)["action"] == "created"
+    assert client.ensure_onu_forward_rule(**_RULE_KWARGS)["action"] == "created"
+    assert len(fake_router.pools) == 1
+
+    fake_router.pools[0].broken = True
+    assert client.ensure_onu_forward_rule(**_RULE_KWARGS)["action"] == "created"
+    assert len(fake_router.pools) == 2
+    assert fake_router.pools[0].disconnected
+
+    client.close()
+    assert fake_router.pools[1].disconnected
+
+
+def test_mikrotik_client_drops_stale_rule_id_on_no_such_item(fake_router):
+    fake_router.rule_id = "*1"
+    client = MikrotikClient(MikrotikConfig(host="h", username="u", password="p"))
+    assert client.ensure_onu_forward_rule(**_RULE_KWARGS)["action"] == "updated"
+
+    fake_router.set_error = routeros_api.exceptions.RouterOsApiCommunicationError("no such item", b"no such item")
+    fake_router.rule_id = None
+    assert client.ensure_onu_forward_rule(**_RULE_KWARGS)["action"] == "created"
+    assert fake_router.calls == ["get", "set:*1", "set:*1", "get", "add"]
+    assert len(fake_router.pools) == 1
+
+
+def test_mikrotik_client_reconnects_when_cached_set_hits_dead_connection(fake_router):
+    fake_router.rule_id = "*1"
+    client = MikrotikClient(MikrotikConfig(host="h", username="u", password="p"))
+    assert client.ensure_onu_forward_rule(**_RULE_KWARGS)["action"] == "updated"
+
+    fake_router.pools[0].broken = True
+    assert client.ensure_onu_forward_rule(**_RULE_KWARGS)["action"] == "updated"
+    assert fake_router.calls == ["get", "set:*1", "set:*1"]
+    assert len(fake_router.pools) == 2
+    assert fake_router.pools[0].disconnected
@@ -0,0 +1,71 @@
+import httpx
+import pytest
+
+from app.util import retry
+from app.util.retry import _retry_after, is_retryable_httpx, is_transient_httpx, retry_httpx
+
+
+def _status_error(
+    status: int, headers: dict[str, str] | None = None, method: str = "GET"
+) -> httpx.HTTPStatusError:
+    req = httpx.Request(method, "http://nuxbill.local/api")
+    resp = httpx.Response(status, headers=headers, request=req)
+    return httpx.HTTPStatusError("err", request=req, response=resp)
+
+
+def test_retry_classification():
+    assert is_retryable_httpx(httpx.ConnectError("down"))
+    assert is_retryable_httpx(_status_error(503))
+    assert is_retryable_httpx(_status_error(429))
+    assert not is_retryable_httpx(_status_error(401))
+    assert not is_retryable_httpx(_status_error(404))
+    assert not is_retryable_httpx(ValueError("x"))
+
+
+def test_write_requests_retry_only_when_never_sent():
+    req = httpx.Request("POST", "http://nuxbill.local/api")
+    assert not is_retryable_httpx(_status_error(502, method="POST"))
+    assert not is_retryable_httpx(_status_error(429, method="POST"))
+    assert not is_retryable_httpx(httpx.ReadTimeout("slow", request=req))
+    assert is_retryable_httpx(httpx.ReadTimeout("slow", request=httpx.Request("GET", "http://nuxbill.local/api")))
+    assert is_retryable_httpx(httpx.ConnectError("down", request=req))
+    assert is_retryable_httpx(httpx.PoolTimeout("busy", request=req))
+    assert is_transient_httpx(_status_error(502, method="POST"))
+
+
+def test_retry_after_is_honored_and_capped():
+    assert _retry_after(_status_error(429, {"Retry-After": "1"})) == 1.0
+    assert _retry_after(_status_error(429, {"Retry-After": "120"})) == 2.0
+    assert _retry_after(_status_error(429)) is None
+    assert _retry_after(_status_error(503, {"Retry-After": "1"})) is None
+
+
+async def test_retry_httpx_retries_transient_errors_only(monkeypatch):
+    sleeps: list[float] = []
+
+    async def fake_sleep(delay: float) -> None:
+        sleeps.append(delay)
+
+    monkeypatch.setattr(retry.asyncio, "sleep", fake_sleep)
+    calls = {"n": 0}
+
+    @retry_httpx(attempts=3)
+    async def flaky() -> str:
+        calls["n"] += 1
+        if calls["n"] < 3:
+            raise httpx.ConnectError("down")
+        return "ok"
+
+    assert await flaky() == "ok"
+    assert calls["n"] == 3
+    assert len(sleeps) == 2
+
+    @retry_httpx(attempts=3)
+    async def forbidden() -> None:
+        calls["n"] += 1
+        raise _status_error(403)
+
+    calls["n"] = 0
+    with pytest.raises(httpx.HTTPStatusError):
+        await forbidden()
+    assert calls["n"] == 1
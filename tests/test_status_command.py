@@ -0,0 +1,31 @@
+from app.commands.handlers import BotContext, handle_command
+from app.nuxbill.service import NuxBillService
+
+
+class DummyNuxBill:
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+
+    async def get_customer_view_by_username(self, username: str):
+        self.calls.append(f"viewu:{username}")
+        return {
+            "d": {"id": 41, "username": username, "fullname": "Nama 1", "status": "Active", "pppoe_ip": "10.0.0.2"},
+            "packages": [{"id": 3, "plan_id": 7, "type": "PPPOE", "status": "on", "namebp": "10M"}],
+        }
+
+    async def get_customer_view_by_id(self, customer_id: int):
+        self.calls.append(f"view:{customer_id}")
+        raise AssertionError("status should reuse the username view")
+
+    parse_customer = staticmethod(NuxBillService.parse_customer)
+    parse_pppoe_packages = staticmethod(NuxBillService.parse_pppoe_packages)
+
+
+async def test_status_renders_from_single_view():
+    nux = DummyNuxBill()
+    ctx = BotContext(nuxbill=nux, activate_using="zero")
+    res = await handle_command(ctx, "status", ["user1"])
+    assert nux.calls == ["viewu:user1"]
+    assert "Username: user1" in res.text
+    assert "IP: 10.0.0.2" in res.text
+    assert "Paket: 10M | on" in res.text
@@ -0,0 +1,29 @@
+import httpx
+import orjson
+
+from app.telegram.client import TelegramClient
+
+
+async def test_send_message_posts_json_body():
+    seen: dict = {}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        seen["url"] = str(request.url)
+        seen["content_type"] = request.headers.get("content-type")
+        seen["body"] = orjson.loads(request.content)
+        return httpx.Response(200, json={"ok": True, "result": {"message_id": 9}})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        client = TelegramClient(bot_token="123:abc", http=http)
+        res = await client.send_message(5, "halo", reply_to_message_id=3, parse_mode="HTML")
+    assert res == {"ok": True, "result": {"message_id": 9}}
+    assert seen["url"] == "https://api.telegram.org/bot123:abc/sendMessage"
+    assert seen["content_type"] == "application/json"
+    assert seen["body"] == {
+        "chat_id": 5,
+        "text": "halo",
+        "disable_web_page_preview": True,
+        "reply_to_message_id": 3,
+        "parse_mode": "HTML",
+    }
+
@@ -21,7 +21,7 @@ def test_validate_page_ok():
     assert validate_page("1") == 1
 
 
-@pytest.mark.parametrize("value", ["0", "-1", "abc", "100000"])
+@pytest.mark.parametrize("value", ["0", "-1", "abc", "100000", "²", "+5", "1_0"])
 def test_validate_page_bad(value: str):
     with pytest.raises(ValueError):
         validate_page(value)